@@ -0,0 +1,52 @@
+"""Serial versus parallel PDF text extraction.
+
+Run from the backend directory:
+
+    python -m benchmarks.pdf_extraction --pages 300 --workers 2 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_pdf
+from services.pdf_extraction import extract_page_range, iter_pages_parallel, shutdown_extraction_pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count() or 1])
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--page-timeout", type=float, default=10)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as pdf_file:
+        pdf_file.write(generate_pdf(args.pages))
+    print(f"{args.pages} pages, {os.path.getsize(path) / 1024 ** 2:.1f} MiB")
+    print(f"{'mode':>12} {'seconds':>8} {'pages/s':>8}")
+
+    try:
+        started = time.perf_counter()
+        serial = extract_page_range(path, 0, args.pages, args.page_timeout)
+        elapsed = time.perf_counter() - started
+        print(f"{'serial':>12} {elapsed:>8.2f} {args.pages / elapsed:>8.1f}")
+
+        for workers in args.workers:
+            shutdown_extraction_pool()
+            # Start the pool outside the timed section
+            list(iter_pages_parallel(path, min(workers, args.pages), workers, 1, args.page_timeout))
+
+            started = time.perf_counter()
+            parallel = list(iter_pages_parallel(path, args.pages, workers, args.pages_per_task, args.page_timeout))
+            elapsed = time.perf_counter() - started
+            assert parallel == serial, "parallel extraction must match serial output"
+            print(f"{f'{workers} workers':>12} {elapsed:>8.2f} {args.pages / elapsed:>8.1f}")
+    finally:
+        shutdown_extraction_pool()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Accuracy and latency of the torch, quantized and ONNX inference backends.
+
+Answers the fixed SQuAD-style sample in ``benchmarks/data/squad_sample.json``
+with each backend and reports exact match, F1 and latency. Embedding backends
+are compared by cosine similarity to the torch vectors, and the summarizer by
+latency only. Run from the backend directory:
+
+    python -m benchmarks.qa_backends --backends torch quantized onnx
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import string
+import time
+from collections import Counter
+
+import numpy as np
+
+from config import EMBEDDING_MODEL, QA_MODEL, SUMMARIZER_MODEL
+from services.backends import BACKENDS, load_embeddings, load_qa_model, load_summarizer
+from services.diversity import normalize_rows
+from services.model_registry import ModelRegistry
+from services.qa_service import QAService
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "squad_sample.json")
+
+
+def normalize_answer(text: str) -> str:
+    """SQuAD answer normalization: lowercase, drop punctuation, articles and extra whitespace"""
+    text = "".join(char for char in text.lower() if char not in string.punctuation)
+    text = re.sub(r"\b(a|an|the)\b", " ", text)
+    return " ".join(text.split())
+
+
+def f1_score(prediction: str, answer: str) -> float:
+    predicted, expected = normalize_answer(prediction).split(), normalize_answer(answer).split()
+    common = sum((Counter(predicted) & Counter(expected)).values())
+    if not common:
+        return 0.0
+    precision, recall = common / len(predicted), common / len(expected)
+    return 2 * precision * recall / (precision + recall)
+
+
+def percentile(values, pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+def bench_qa(backend: str, examples: list) -> dict:
+    ModelRegistry.register("qa_model", lambda: load_qa_model(QA_MODEL, backend))
+    started = time.perf_counter()
+    ModelRegistry.get("qa_model")
+    load_seconds = time.perf_counter() - started
+
+    qa = QAService()
+    questions = [example["question"] for example in examples]
+    contexts = [example["context"] for example in examples]
+    qa._find_best_spans(questions[:1], contexts[:1])
+
+    latencies, predictions = [], []
+    for question, context in zip(questions, contexts):
+        started = time.perf_counter()
+        predictions.append(qa._find_best_spans([question], [context])[0][0])
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    qa._find_best_spans(questions, contexts)
+    batch_seconds = time.perf_counter() - started
+
+    exact = [
+        max(float(normalize_answer(prediction) == normalize_answer(answer)) for answer in example["answers"])
+        for prediction, example in zip(predictions, examples)
+    ]
+    f1 = [
+        max(f1_score(prediction, answer) for answer in example["answers"])
+        for prediction, example in zip(predictions, examples)
+    ]
+    return {
+        "load_seconds": load_seconds,
+        "exact_match": 100 * statistics.mean(exact),
+        "f1": 100 * statistics.mean(f1),
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+        "batch_per_s": len(examples) / batch_seconds,
+        "stats": ModelRegistry.stats()["qa_model"],
+    }
+
+
+def bench_embeddings(backend: str, texts: list, reference) -> dict:
+    embeddings = load_embeddings(EMBEDDING_MODEL, backend)
+    embeddings.embed_documents(texts[:1])
+    started = time.perf_counter()
+    vectors = normalize_rows(np.array(embeddings.embed_documents(texts)))
+    seconds = time.perf_counter() - started
+    agreement = float((vectors * reference).sum(axis=1).mean()) if reference is not None else 1.0
+    return {"vectors": vectors, "texts_per_s": len(texts) / seconds, "cosine_to_torch": agreement}
+
+
+def bench_summarizer(backend: str, texts: list) -> float:
+    summarizer = load_summarizer(SUMMARIZER_MODEL, backend)
+    started = time.perf_counter()
+    summarizer(texts, batch_size=len(texts), max_length=60, min_length=10, do_sample=False, truncation=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--sample", default=SAMPLE_PATH)
+    parser.add_argument("--skip-summarizer", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.sample) as sample:
+        examples = json.load(sample)
+    contexts = list(dict.fromkeys(example["context"] for example in examples))
+    print(f"{len(examples)} questions over {len(contexts)} contexts, QA model {QA_MODEL}")
+
+    print(f"{'backend':>10} {'load s':>7} {'EM':>6} {'F1':>6} {'p50 ms':>7} {'p95 ms':>7} {'batch q/s':>9} {'weights MiB':>11}")
+    for backend in args.backends:
+        result = bench_qa(backend, examples)
+        weights = result["stats"].get("parameter_bytes")
+        weights = f"{weights / 1024 ** 2:.1f}" if weights else "-"
+        print(
+            f"{backend:>10} {result['load_seconds']:>7.2f} {result['exact_match']:>6.1f} {result['f1']:>6.1f} "
+            f"{result['p50_ms']:>7.1f} {result['p95_ms']:>7.1f} {result['batch_per_s']:>9.1f} {weights:>11}"
+        )
+
+    print(f"\nEmbeddings ({EMBEDDING_MODEL})")
+    print(f"{'backend':>10} {'texts/s':>8} {'cosine to torch':>15}")
+    reference = None
+    for backend in ["torch"] + [backend for backend in args.backends if backend != "torch"]:
+        result = bench_embeddings(backend, contexts, reference)
+        if reference is None:
+            reference = result["vectors"]
+        print(f"{backend:>10} {result['texts_per_s']:>8.1f} {result['cosine_to_torch']:>15.4f}")
+
+    if not args.skip_summarizer:
+        print(f"\nSummarizer ({SUMMARIZER_MODEL})")
+        print(f"{'backend':>10} {'seconds':>8}")
+        for backend in args.backends:
+            print(f"{backend:>10} {bench_summarizer(backend, contexts):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
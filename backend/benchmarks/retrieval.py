@@ -0,0 +1,140 @@
+"""Recall@k and query latency of dense, lexical and hybrid retrieval.
+
+Indexes a synthetic document in which every fact names a unique, made-up
+entity, then asks two kinds of questions about each sampled fact: keyword
+questions that mention the entity, and descriptive ones that only paraphrase
+the fact. A question is a hit at k when one of the top k chunks contains
+the fact. Run from the backend directory:
+
+    python -m benchmarks.retrieval --facts 400 --queries 100
+"""
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+import services.document_processor as document_processor
+from benchmarks.synthetic import CHARS_PER_PAGE, generate_sentence
+from services.document_processor import DocumentProcessor
+from services.ingestion import SpooledUpload
+
+_SYLLABLES = ["ka", "lo", "mir", "ve", "tan", "dor", "zu", "phi", "rel", "os", "bri", "num", "sel", "gar"]
+_ACTIONS = [
+    ("surveyed", "the coastal wetlands", "Who surveyed the coastal wetlands in {year}?"),
+    ("founded", "a printing workshop", "Who founded a printing workshop in {year}?"),
+    ("discovered", "a new copper deposit", "Who discovered a copper deposit in {year}?"),
+    ("designed", "the northern railway bridge", "Who designed the railway bridge in {year}?"),
+    ("translated", "an early astronomy treatise", "Who translated the astronomy treatise in {year}?"),
+    ("catalogued", "rare mountain orchids", "Who catalogued mountain orchids in {year}?"),
+]
+
+# (label, RETRIEVAL_MODE, LEXICAL_SKIP_RATIO)
+MODES = [
+    ("dense", "dense", 0.0),
+    ("lexical", "lexical", 0.0),
+    ("hybrid", "hybrid", 0.0),
+    ("hybrid+skip", "hybrid", 2.0),
+]
+
+
+def generate_facts(num_facts: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    names, facts = set(), []
+    while len(facts) < num_facts:
+        name = "".join(rng.choice(_SYLLABLES) for _ in range(3)).capitalize()
+        if name in names:
+            continue
+        names.add(name)
+        verb, target, question = rng.choice(_ACTIONS)
+        year = rng.randint(1700, 1999)
+        facts.append({
+            "text": f"In {year}, {name} {verb} {target}, recording {rng.randint(10, 9999)} entries.",
+            "keyword": f"What did {name} do in {year}?",
+            "descriptive": question.format(year=year),
+        })
+    return facts
+
+
+def build_document(facts: list, seed: int = 0) -> str:
+    """Interleave the facts with filler sentences, page by page"""
+    rng = random.Random(seed)
+    paragraphs, remaining = [], list(facts)
+    while remaining:
+        sentences = [generate_sentence(rng) for _ in range(rng.randint(2, 4))]
+        for _ in range(min(len(remaining), rng.randint(1, 2))):
+            sentences.insert(rng.randint(0, len(sentences)), remaining.pop(0)["text"])
+        paragraphs.append(" ".join(sentences))
+    pages, page, length = [], [], 0
+    for paragraph in paragraphs:
+        page.append(paragraph)
+        length += len(paragraph)
+        if length >= CHARS_PER_PAGE:
+            pages.append("\n\n".join(page))
+            page, length = [], 0
+    if page:
+        pages.append("\n\n".join(page))
+    return "\n\n".join(pages)
+
+
+def index_document(processor: DocumentProcessor, text: str):
+    data = text.encode("utf-8")
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(fd, "wb") as text_file:
+        text_file.write(data)
+    upload = SpooledUpload(path, "retrieval.txt", len(data), hashlib.sha256(data).hexdigest())
+    try:
+        return processor.index_upload(upload, session_id="retrieval-benchmark")
+    finally:
+        upload.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--facts", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    facts = generate_facts(args.facts, args.seed)
+    processor = DocumentProcessor()
+    started = time.perf_counter()
+    document = index_document(processor, build_document(facts, args.seed))
+    print(
+        f"{args.facts} facts, {document.vector_store.index.ntotal} chunks, "
+        f"indexed in {time.perf_counter() - started:.1f}s"
+    )
+
+    sample = random.Random(args.seed).sample(facts, min(args.queries, len(facts)))
+    max_k = max(args.k)
+    header = " ".join(f"{f'R@{k}':>6}" for k in args.k)
+    print(f"{'mode':>12} {'queries':>11} {header} {'p50 ms':>7} {'p95 ms':>7}")
+    for label, mode, skip_ratio in MODES:
+        document_processor.RETRIEVAL_MODE = mode
+        document_processor.LEXICAL_SKIP_RATIO = skip_ratio
+        for kind in ("keyword", "descriptive"):
+            # Start cold so dense modes pay for embedding every question
+            processor.query_embedding_cache.clear()
+            hits = {k: 0 for k in args.k}
+            latencies = []
+            for fact in sample:
+                started = time.perf_counter()
+                docs = processor.get_relevant_documents(
+                    fact[kind], k=max_k, doc_id=document.doc_id, session_id=document.session_id
+                )
+                latencies.append(time.perf_counter() - started)
+                for k in args.k:
+                    hits[k] += any(fact["text"] in doc.page_content for doc in docs[:k])
+            recalls = " ".join(f"{hits[k] / len(sample):>6.2f}" for k in args.k)
+            print(
+                f"{label:>12} {kind:>11} {recalls} "
+                f"{1000 * np.percentile(latencies, 50):>7.2f} {1000 * np.percentile(latencies, 95):>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+"""End-to-end benchmark and load test: ingestion, summaries and concurrent /ask.
+
+Synthetic TXT and PDF documents of increasing size are ingested, summarized
+and asked questions at several concurrency levels. By default the models are
+tiny local stand-ins (see ``benchmarks.tiny_models``), so the suite runs
+offline and measures the pipeline rather than model quality; pass
+``--models configured`` to use the models from the environment instead.
+Caches are disabled unless ``--caches`` is given, so every request does the
+full work.
+
+Targets:
+
+- ``services`` calls DocumentProcessor and QAService directly.
+- ``app`` drives the FastAPI app in-process through an ASGI transport.
+- ``http`` drives a running server at ``--url``. Its models and caches are
+  whatever that server was started with.
+
+Results are written as JSON so runs from different commits can be compared.
+Run from the backend directory:
+
+    python -m benchmarks.suite --pages 1 10 50 --concurrency 1 8 --output before.json
+    python -m benchmarks.suite --target app --concurrency 1 16 --output after.json
+    python -m benchmarks.suite --compare before.json after.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.synthetic import generate_pdf, generate_questions, generate_text
+from benchmarks.tiny_models import build_tiny_models
+
+# config reads the environment when it is first imported, so the app and its
+# services are only imported once configure_environment has run
+
+
+def configure_environment(args) -> Dict[str, str]:
+    """Point the app at the benchmark's models and settings before it is imported"""
+    settings = {
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+        "TOKENIZERS_PARALLELISM": "false",
+        "LOG_LEVEL": "WARNING",
+        "INDEX_CACHE_DIR": os.path.join(args.work_dir, "indexes"),
+        "MAX_DOCUMENTS": str(max(32, 2 * len(args.pages) * len(args.formats))),
+    }
+    if args.models == "tiny":
+        paths = build_tiny_models(os.path.join(args.work_dir, "tiny-models"), args.seed)
+        settings.update(
+            QA_MODEL=paths["qa_model"],
+            SUMMARIZER_MODEL=paths["summarizer"],
+            EMBEDDING_MODEL=paths["embeddings"]
+        )
+    if not args.caches:
+        settings.update(INDEX_CACHE_MAX_BYTES="0", ANSWER_CACHE_SIZE="0", QUERY_EMBEDDING_CACHE_SIZE="0")
+    os.environ.update(settings)
+    return settings
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes"""
+    from services.model_registry import _peak_rss
+
+    return _peak_rss()
+
+
+def latency_stats(latencies: List[float], errors: int, elapsed: float, concurrency: int) -> dict:
+    milliseconds = np.array(latencies) * 1000 if latencies else np.array([np.nan])
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(milliseconds, 50)), 2),
+        "p95_ms": round(float(np.percentile(milliseconds, 95)), 2),
+        "p99_ms": round(float(np.percentile(milliseconds, 99)), 2),
+        "mean_ms": round(float(np.mean(milliseconds)), 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+    }
+
+
+def make_document(kind: str, pages: int, seed: int) -> Tuple[str, bytes]:
+    if kind == "pdf":
+        return f"synthetic-{pages}.pdf", generate_pdf(pages, seed)
+    return f"synthetic-{pages}.txt", generate_text(pages, seed).encode()
+
+
+def ingestion_result(kind: str, pages: int, data: bytes, seconds: float, chunks: Optional[int]) -> dict:
+    return {
+        "format": kind,
+        "pages": pages,
+        "bytes": len(data),
+        "chunks": chunks,
+        "ingest_seconds": round(seconds, 4),
+        "pages_per_second": round(pages / seconds, 2),
+        "mib_per_second": round(len(data) / seconds / 1024 ** 2, 3),
+    }
+
+
+class ServicesTarget:
+    """Calls the services directly, without HTTP or the inference executor"""
+
+    def __init__(self, args):
+        from services.document_processor import DocumentProcessor
+        from services.model_registry import ModelRegistry
+        from services.qa_service import QAService
+
+        self.args = args
+        self.registry = ModelRegistry
+        self.processor = DocumentProcessor()
+        self.qa = QAService(self.processor)
+
+    def warm_up(self) -> dict:
+        """Load the models and run every stage once, so first-call costs are not measured"""
+        self.registry.warm_up(["all"])
+        stats = self.registry.stats()
+        self.document("txt", 1, concurrency=[1], questions=1)
+        return stats
+
+    def document(
+        self,
+        kind: str,
+        pages: int,
+        concurrency: Optional[List[int]] = None,
+        questions: Optional[int] = None
+    ) -> dict:
+        from services.ingestion import SpooledUpload
+        from services.metrics import start_profile
+
+        filename, data = make_document(kind, pages, self.args.seed)
+        fd, path = tempfile.mkstemp(dir=self.args.work_dir, suffix=os.path.splitext(filename)[1])
+        with os.fdopen(fd, "wb") as spooled:
+            spooled.write(data)
+        upload = SpooledUpload(path, filename, len(data), hashlib.sha256(data).hexdigest())
+
+        profile = start_profile()
+        try:
+            started = time.perf_counter()
+            document = self.processor.index_upload(upload, "benchmark")
+            ingest_seconds = time.perf_counter() - started
+        finally:
+            upload.cleanup()
+        result = ingestion_result(kind, pages, data, ingest_seconds, document.vector_store.index.ntotal)
+
+        if not self.args.skip_summary:
+            started = time.perf_counter()
+            self.processor.get_summary(document)
+            result["summary_seconds"] = round(time.perf_counter() - started, 4)
+        result["stages"] = profile.stages()
+        result["ask"] = [
+            self.ask(document.doc_id, level, questions or self.args.questions)
+            for level in concurrency or self.args.concurrency
+        ]
+        return result
+
+    def ask(self, doc_id: str, concurrency: int, count: int) -> dict:
+        questions = generate_questions(count, self.args.seed)
+        latencies, errors = [], 0
+        lock = threading.Lock()
+
+        def ask_one(question: str):
+            nonlocal errors
+            started = time.perf_counter()
+            try:
+                self.qa.get_answer(question, doc_id, "benchmark")
+            except Exception:
+                with lock:
+                    errors += 1
+                return
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(ask_one, questions))
+        return latency_stats(latencies, errors, time.perf_counter() - started, concurrency)
+
+    def rss(self) -> Optional[int]:
+        from services.model_registry import _current_rss
+        return _current_rss()
+
+
+class AppTarget:
+    """Drives the FastAPI app over HTTP semantics, in-process or against a running server"""
+
+    def __init__(self, args):
+        import httpx
+
+        self.args = args
+        if args.target == "app":
+            import main
+
+            self.app = main.app
+            self.client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark", timeout=None
+            )
+        else:
+            self.app = None
+            self.client = httpx.AsyncClient(base_url=args.url, timeout=None)
+        self.headers = {"X-Session-Id": f"benchmark-{os.getpid()}", "X-Profile": "1"}
+
+    async def warm_up(self) -> dict:
+        """Load the models and run every stage once, so first-call costs are not measured"""
+        if self.app is not None:
+            from services.model_registry import ModelRegistry
+            ModelRegistry.warm_up(["all"])
+        response = await self.client.get("/models")
+        response.raise_for_status()
+        await self.document("txt", 1, concurrency=[1], questions=1)
+        return response.json()
+
+    async def document(
+        self,
+        kind: str,
+        pages: int,
+        concurrency: Optional[List[int]] = None,
+        questions: Optional[int] = None
+    ) -> dict:
+        filename, data = make_document(kind, pages, self.args.seed)
+        started = time.perf_counter()
+        response = await self.client.post(
+            "/upload",
+            files={"file": (filename, data)},
+            params={"summarize": "false" if self.args.skip_summary else "true"},
+            headers=self.headers
+        )
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+
+        # The job reports doc_id once the index is ready, then completes once summarized
+        indexed_at = None
+        while True:
+            job = (await self.client.get(f"/jobs/{job_id}", headers=self.headers)).json()
+            if indexed_at is None and job.get("doc_id"):
+                indexed_at = time.perf_counter()
+            if job["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(0.01)
+        finished_at = time.perf_counter()
+        if job["status"] == "failed":
+            raise RuntimeError(f"Upload of {filename} failed: {job['error']}")
+
+        chunks = job["progress"].get("embedding", {}).get("done")
+        result = ingestion_result(kind, pages, data, indexed_at - started, chunks)
+        if not self.args.skip_summary:
+            result["summary_seconds"] = round(finished_at - indexed_at, 4)
+        result["stages"] = job.get("timings", {})
+        result["ask"] = [
+            await self.ask(job["doc_id"], level, questions or self.args.questions)
+            for level in concurrency or self.args.concurrency
+        ]
+        return result
+
+    async def ask(self, doc_id: str, concurrency: int, count: int) -> dict:
+        questions = generate_questions(count, self.args.seed)
+        latencies, errors = [], 0
+        statuses: Dict[str, int] = {}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def ask_one(question: str):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await self.client.post(
+                    "/ask", json={"question": question, "doc_id": doc_id}, headers=self.headers
+                )
+                elapsed = time.perf_counter() - started
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            if response.status_code == 200:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(ask_one(question) for question in questions))
+        result = latency_stats(latencies, errors, time.perf_counter() - started, concurrency)
+        result["status_codes"] = statuses
+        return result
+
+    async def rss(self) -> Optional[int]:
+        if self.app is not None:
+            from services.model_registry import _current_rss
+            return _current_rss()
+        # A remote server only reports its memory through /metrics
+        response = await self.client.get("/metrics")
+        for line in response.text.splitlines():
+            if line.startswith("process_resident_memory_bytes"):
+                return int(float(line.split()[-1]))
+        return None
+
+    async def close(self):
+        await self.client.aclose()
+
+
+async def run_app(args) -> Tuple[dict, List[dict]]:
+    target = AppTarget(args)
+    try:
+        models = await target.warm_up()
+        results = []
+        for kind in args.formats:
+            for pages in args.pages:
+                result = await target.document(kind, pages)
+                result["rss_bytes"] = await target.rss()
+                print_result(result)
+                results.append(result)
+        return models, results
+    finally:
+        await target.close()
+
+
+def run_services(args) -> Tuple[dict, List[dict]]:
+    target = ServicesTarget(args)
+    models = target.warm_up()
+    results = []
+    for kind in args.formats:
+        for pages in args.pages:
+            result = target.document(kind, pages)
+            result["rss_bytes"] = target.rss()
+            print_result(result)
+            results.append(result)
+    return models, results
+
+
+def print_result(result: dict):
+    summary = f"{result['summary_seconds']:.2f}s" if "summary_seconds" in result else "skipped"
+    print(
+        f"{result['format']} {result['pages']} pages: ingest {result['ingest_seconds']:.2f}s "
+        f"({result['pages_per_second']:.1f} pages/s, {result['chunks']} chunks), summary {summary}"
+    )
+    for ask in result["ask"]:
+        print(
+            f"  /ask x{ask['concurrency']}: p50 {ask['p50_ms']:.1f} ms, p95 {ask['p95_ms']:.1f} ms, "
+            f"p99 {ask['p99_ms']:.1f} ms, {ask['throughput_rps']} req/s, {ask['errors']} errors"
+        )
+
+
+def git_revision() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True
+        ).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def compare(baseline_path: str, candidate_path: str):
+    """Print how each metric changed between two result files"""
+    with open(baseline_path) as baseline_file, open(candidate_path) as candidate_file:
+        baseline, candidate = json.load(baseline_file), json.load(candidate_file)
+
+    def keyed(results: List[dict]) -> Dict[tuple, dict]:
+        metrics = {}
+        for result in results:
+            document = (result["format"], result["pages"])
+            for name in ("ingest_seconds", "summary_seconds", "rss_bytes"):
+                if result.get(name) is not None:
+                    metrics[document + (name,)] = result[name]
+            for ask in result["ask"]:
+                for name in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+                    metrics[document + (f"ask x{ask['concurrency']} {name}",)] = ask[name]
+        return metrics
+
+    before, after = keyed(baseline["results"]), keyed(candidate["results"])
+    print(f"{baseline['meta']['git']['commit'] or baseline_path} -> {candidate['meta']['git']['commit'] or candidate_path}")
+    print(f"{'document':>10} {'metric':>24} {'before':>12} {'after':>12} {'change':>8}")
+    for key in sorted(before.keys() & after.keys()):
+        kind, pages, name = key
+        old, new = before[key], after[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{kind + ' ' + str(pages):>10} {name:>24} {old:>12.4g} {new:>12.4g} {change:>8}")
+    peak_before, peak_after = baseline.get("peak_rss_bytes"), candidate.get("peak_rss_bytes")
+    if peak_before and peak_after:
+        print(f"{'':>10} {'peak_rss_bytes':>24} {peak_before:>12.4g} {peak_after:>12.4g} "
+              f"{(peak_after - peak_before) / peak_before * 100:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=["services", "app", "http"], default="services")
+    parser.add_argument("--url", default="http://localhost:8000", help="Server to drive with --target http")
+    parser.add_argument("--models", choices=["tiny", "configured"], default="tiny")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--formats", nargs="+", choices=["txt", "pdf"], default=["txt", "pdf"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--questions", type=int, default=64, help="Questions asked at each concurrency level")
+    parser.add_argument("--skip-summary", action="store_true")
+    parser.add_argument("--caches", action="store_true", help="Keep the index, answer and query caches enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default=os.path.join(".cache", "benchmarks"))
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"), help="Compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    settings = configure_environment(args) if args.target != "http" else {}
+
+    import torch
+    from config import EMBEDDING_MODEL, INFERENCE_BACKEND, QA_MODEL, SUMMARIZER_MODEL
+
+    started = time.time()
+    if args.target == "services":
+        models, results = run_services(args)
+    else:
+        models, results = asyncio.run(run_app(args))
+
+    report = {
+        "meta": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started)),
+            "duration_seconds": round(time.time() - started, 2),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "target": args.target,
+            "models": "remote" if args.target == "http" else {
+                "source": args.models,
+                "qa_model": QA_MODEL,
+                "summarizer": SUMMARIZER_MODEL,
+                "embeddings": EMBEDDING_MODEL,
+                "backend": INFERENCE_BACKEND,
+            },
+            "settings": settings,
+            "args": {name: value for name, value in vars(args).items() if name != "compare"},
+        },
+        "model_stats": models,
+        "results": results,
+        # Only meaningful for in-process targets
+        "peak_rss_bytes": peak_rss() if args.target != "http" else None,
+    }
+    if report["peak_rss_bytes"]:
+        print(f"peak RSS {report['peak_rss_bytes'] / 1024 ** 2:.0f} MiB")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
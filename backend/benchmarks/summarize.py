@@ -0,0 +1,42 @@
+"""Summarization throughput at different batch sizes.
+
+Run from the backend directory:
+
+    python -m benchmarks.summarize --pages 20 --batch-sizes 1 2 4 8
+"""
+import argparse
+import time
+
+import torch
+
+from benchmarks.synthetic import generate_text
+from config import SUMMARY_CHUNK_TOKENS
+from services.model_registry import ModelRegistry
+from services.summarizer import MapReduceSummarizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-tokens", type=int, default=SUMMARY_CHUNK_TOKENS)
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads())
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    text = generate_text(args.pages)
+    pipeline = ModelRegistry.get("summarizer")
+    print(f"{args.pages} pages, {len(text)} chars, {args.threads} CPU threads")
+    print(f"{'batch':>5} {'chunks':>6} {'seconds':>8} {'pages/s':>8}")
+
+    for batch_size in args.batch_sizes:
+        summarizer = MapReduceSummarizer(pipeline, batch_size=batch_size, chunk_tokens=args.chunk_tokens)
+        num_chunks = len(summarizer.split_text(text))
+        started = time.perf_counter()
+        summarizer.summarize(text)
+        elapsed = time.perf_counter() - started
+        print(f"{batch_size:>5} {num_chunks:>6} {elapsed:>8.2f} {args.pages / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import random
+from typing import List
+
+_SUBJECTS = [
+    "The committee", "Marie Curie", "The 1998 survey", "Our model", "The river Danube",
+    "The engine", "Professor Okafor", "The treaty of 1648", "The algorithm", "The city council"
+]
+_VERBS = [
+    "described", "measured", "introduced", "compared", "rejected",
+    "summarized", "improved", "predicted", "documented", "questioned"
+]
+_OBJECTS = [
+    "the annual budget of 42 million euros", "a new method for sorting records",
+    "the difference between the two samples", "the causes of the 1929 crisis",
+    "the benefits of renewable energy", "several limitations of the design",
+    "the main steps of the process", "an example from the northern region",
+    "the relationship between price and demand", "the definition of entropy"
+]
+
+CHARS_PER_PAGE = 3000
+
+
+def generate_sentence(rng: random.Random) -> str:
+    return f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}."
+
+
+def generate_pages(num_pages: int, seed: int = 0) -> List[str]:
+    """Generate deterministic, English-like pages of roughly CHARS_PER_PAGE characters"""
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(num_pages):
+        paragraphs, length = [], 0
+        while length < CHARS_PER_PAGE:
+            paragraph = " ".join(generate_sentence(rng) for _ in range(rng.randint(3, 7)))
+            paragraphs.append(paragraph)
+            length += len(paragraph) + 2
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+
+def generate_text(num_pages: int, seed: int = 0) -> str:
+    return "\n\n".join(generate_pages(num_pages, seed))
+
+
+def generate_questions(count: int, seed: int = 0) -> List[str]:
+    """Questions answerable from the synthetic pages, distinct until all combinations are used"""
+    combinations = [(verb, obj) for verb in _VERBS for obj in _OBJECTS]
+    random.Random(seed).shuffle(combinations)
+    return [f"Who {verb} {obj}?" for verb, obj in (combinations[i % len(combinations)] for i in range(count))]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def generate_pdf(num_pages: int, seed: int = 0, chars_per_line: int = 95) -> bytes:
+    """Build a text-only PDF with one synthetic page per PDF page, without extra dependencies"""
+    objects: List[bytes] = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    font_id = 1
+    pages_id = 2 + 2 * num_pages
+    page_ids = []
+
+    for text in generate_pages(num_pages, seed):
+        lines = []
+        for paragraph in text.split("\n\n"):
+            lines.extend(paragraph[i:i + chars_per_line] for i in range(0, len(paragraph), chars_per_line))
+            lines.append("")
+        operations = ["BT", "/F1 9 Tf", "36 806 Td", "11 TL"]
+        operations += [f"({_pdf_escape(line)}) '" for line in lines]
+        operations.append("ET")
+        stream = "\n".join(operations).encode("latin-1")
+
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        )
+        page_ids.append(len(objects))
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, num_pages))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    catalog_id = len(objects)
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref_offset
+    )
+    return bytes(pdf)
@@ -0,0 +1,118 @@
+"""Tiny, randomly initialised stand-ins for the app's three models.
+
+They keep the real architectures (RoBERTa extractive QA, BART summarization and
+a sentence-transformers RoBERTa encoder with mean pooling) at a fraction of the
+size, with a byte-level BPE vocabulary trained on the synthetic documents. They
+are built locally without any downloads, so benchmarks run offline and measure
+the pipeline around the models rather than the models themselves. Build them
+on their own with:
+
+    python -m benchmarks.tiny_models --output .cache/tiny-models
+"""
+import argparse
+import json
+import os
+from typing import Dict
+
+from benchmarks.synthetic import generate_pages
+
+# Bump when the recipe changes so stale builds are replaced
+RECIPE_VERSION = 1
+HIDDEN_SIZE = 32
+VOCAB_SIZE = 1000
+
+
+def build_tiny_models(directory: str, seed: int = 0) -> Dict[str, str]:
+    """Build (or reuse) the tiny models under ``directory`` and return their paths by model name"""
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    from tokenizers import ByteLevelBPETokenizer
+    from transformers import (
+        BartConfig,
+        BartForConditionalGeneration,
+        BartTokenizerFast,
+        RobertaConfig,
+        RobertaForQuestionAnswering,
+        RobertaModel,
+        RobertaTokenizerFast,
+    )
+
+    paths = {
+        "qa_model": os.path.join(directory, "qa"),
+        "summarizer": os.path.join(directory, "summarizer"),
+        "embeddings": os.path.join(directory, "embeddings"),
+    }
+    recipe = {"version": RECIPE_VERSION, "seed": seed, "hidden_size": HIDDEN_SIZE, "vocab_size": VOCAB_SIZE}
+    marker = os.path.join(directory, "recipe.json")
+    if os.path.exists(marker):
+        with open(marker) as marker_file:
+            if json.load(marker_file) == recipe:
+                return paths
+
+    torch.manual_seed(seed)
+    vocabulary_dir = os.path.join(directory, "vocabulary")
+    os.makedirs(vocabulary_dir, exist_ok=True)
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(
+        generate_pages(200, seed),
+        vocab_size=VOCAB_SIZE,
+        special_tokens=["<s>", "<pad>", "</s>", "<unk>", "<mask>"]
+    )
+    bpe.save_model(vocabulary_dir)
+    vocab_file = os.path.join(vocabulary_dir, "vocab.json")
+    merges_file = os.path.join(vocabulary_dir, "merges.txt")
+    special_ids = {"pad_token_id": 1, "bos_token_id": 0, "eos_token_id": 2}
+    encoder = dict(
+        vocab_size=bpe.get_vocab_size(),
+        hidden_size=HIDDEN_SIZE,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=2 * HIDDEN_SIZE,
+        max_position_embeddings=520,
+        **special_ids
+    )
+
+    qa_tokenizer = RobertaTokenizerFast(vocab_file=vocab_file, merges_file=merges_file, model_max_length=512)
+    qa_tokenizer.save_pretrained(paths["qa_model"])
+    RobertaForQuestionAnswering(RobertaConfig(**encoder)).save_pretrained(paths["qa_model"])
+
+    BartTokenizerFast(vocab_file=vocab_file, merges_file=merges_file, model_max_length=1024).save_pretrained(
+        paths["summarizer"]
+    )
+    BartForConditionalGeneration(BartConfig(
+        vocab_size=bpe.get_vocab_size(),
+        d_model=HIDDEN_SIZE,
+        encoder_layers=1,
+        decoder_layers=1,
+        encoder_attention_heads=2,
+        decoder_attention_heads=2,
+        encoder_ffn_dim=2 * HIDDEN_SIZE,
+        decoder_ffn_dim=2 * HIDDEN_SIZE,
+        max_position_embeddings=1024,
+        decoder_start_token_id=2,
+        forced_bos_token_id=0,
+        **special_ids
+    )).save_pretrained(paths["summarizer"])
+
+    qa_tokenizer.save_pretrained(paths["embeddings"])
+    RobertaModel(RobertaConfig(**encoder)).save_pretrained(paths["embeddings"])
+    transformer = models.Transformer(paths["embeddings"], max_seq_length=256)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension(), pooling_mode="mean")
+    SentenceTransformer(modules=[transformer, pooling], device="cpu").save(paths["embeddings"])
+
+    with open(marker, "w") as marker_file:
+        json.dump(recipe, marker_file)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default=os.path.join(".cache", "tiny-models"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for name, path in build_tiny_models(args.output, args.seed).items():
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
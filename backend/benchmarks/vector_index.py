@@ -0,0 +1,83 @@
+"""Build time, memory, query latency and recall of the session vector index types.
+
+Chunks are synthetic clustered vectors added document by document, as uploads
+would add them. Recall@k is measured against exact search. Run from the
+backend directory:
+
+    python -m benchmarks.vector_index --sizes 10000 100000 1000000 --dim 768
+"""
+import argparse
+import gc
+import time
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from services.model_registry import _current_rss
+from services.vector_store import VectorIndex
+
+
+def generate_vectors(num: int, dim: int, seed: int = 0, clusters: int = 256) -> np.ndarray:
+    """Gaussian clusters, which is closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=num)
+    return centers[labels] + 0.3 * rng.normal(size=(num, dim)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--types", nargs="+", default=["flat", "ivf", "hnsw"])
+    parser.add_argument("--chunks-per-document", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--ef-search", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"dim {args.dim}, {args.chunks_per_document} chunks per document, k={args.k}")
+    print(f"{'chunks':>8} {'type':>5} {'build s':>8} {'MiB':>7} {'p50 ms':>7} {'p95 ms':>7} {'recall':>6} {'remove ms':>9}")
+    for size in args.sizes:
+        vectors = generate_vectors(size, args.dim)
+        queries = generate_vectors(args.queries, args.dim, seed=1)
+        exact = faiss.IndexFlatL2(args.dim)
+        exact.add(vectors)
+        _, truth = exact.search(queries, args.k)
+        del exact
+
+        for kind in args.types:
+            gc.collect()
+            rss_before = _current_rss()
+            index = VectorIndex(args.dim, index_type=kind, nprobe=args.nprobe, ef_search=args.ef_search)
+            placeholder = Document(page_content="")
+            started = time.perf_counter()
+            for start in range(0, size, args.chunks_per_document):
+                batch = vectors[start:start + args.chunks_per_document]
+                index.add(f"doc-{start}", batch, [placeholder] * len(batch))
+            build_seconds = time.perf_counter() - started
+            memory = (_current_rss() - rss_before) / 1024 ** 2
+
+            latencies, found = [], []
+            for query in queries:
+                started = time.perf_counter()
+                found.append(index.search(query[None], args.k)[0])
+                latencies.append(time.perf_counter() - started)
+            recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+
+            started = time.perf_counter()
+            index.remove("doc-0")
+            remove_ms = 1000 * (time.perf_counter() - started)
+
+            print(
+                f"{size:>8} {kind:>5} {build_seconds:>8.2f} {memory:>7.0f} "
+                f"{1000 * np.percentile(latencies, 50):>7.2f} {1000 * np.percentile(latencies, 95):>7.2f} "
+                f"{recall:>6.3f} {remove_ms:>9.1f}"
+            )
+            del index
+
+
+if __name__ == "__main__":
+    main()
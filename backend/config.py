@@ -0,0 +1,119 @@
+import os
+
+# Document registry
+DEFAULT_SESSION_ID = "default"
+MAX_DOCUMENTS = int(os.getenv("MAX_DOCUMENTS", "32"))
+DOCUMENT_IDLE_SECONDS = float(os.getenv("DOCUMENT_IDLE_SECONDS", "3600"))
+
+# Models
+QA_MODEL = os.getenv("QA_MODEL", "deepset/roberta-base-squad2")
+SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", "facebook/bart-large-cnn")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+# Comma separated model names to load at startup, or "all"
+WARMUP_MODELS = [name.strip() for name in os.getenv("WARMUP_MODELS", "").split(",") if name.strip()]
+# How models run on CPU: "torch" (fp32), "quantized" (dynamic int8) or "onnx" (ONNX Runtime)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+# Per-model overrides, e.g. "qa_model=onnx,embeddings=torch"
+MODEL_BACKENDS = {
+    name.strip(): backend.strip()
+    for name, _, backend in (item.partition("=") for item in os.getenv("MODEL_BACKENDS", "").split(","))
+    if name.strip() and backend.strip()
+}
+# ONNX exports are written here once and reused
+ONNX_EXPORT_DIR = os.getenv("ONNX_EXPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "onnx"))
+
+# Inference executor
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "4"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "32"))
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", "5"))
+# Per-model concurrency limits, e.g. "summarizer=1,qa_model=2"
+INFERENCE_CONCURRENCY = {
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.partition("=") for item in os.getenv("INFERENCE_CONCURRENCY", "summarizer=1,qa_model=2,embeddings=2,ingestion=2").split(",")
+    )
+    if name.strip() and limit.strip()
+}
+
+# Chunking, in QA tokenizer tokens; chunks plus the question must fit QA_MAX_SEQ_LENGTH
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+# Summarization
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "4"))
+# Tokens per summarizer input; capped at the model's maximum input length
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "900"))
+
+# Retrieval
+# Mode: "hybrid" (BM25 and dense results fused), "dense" or "lexical"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Results taken from each retriever before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+# Reciprocal rank fusion constant and per-retriever weights
+RRF_K = int(os.getenv("RRF_K", "60"))
+DENSE_WEIGHT = float(os.getenv("DENSE_WEIGHT", "1.0"))
+LEXICAL_WEIGHT = float(os.getenv("LEXICAL_WEIGHT", "1.0"))
+# Skip the embedding model when the best BM25 hit scores this many times the runner-up; 0 disables it
+LEXICAL_SKIP_RATIO = float(os.getenv("LEXICAL_SKIP_RATIO", "2.0"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Session-wide vector index: "auto" uses exact search up to VECTOR_INDEX_FLAT_MAX chunks and
+# VECTOR_INDEX_LARGE ("ivf" or "hnsw") beyond that; "flat", "ivf" or "hnsw" force a type
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "auto")
+VECTOR_INDEX_LARGE = os.getenv("VECTOR_INDEX_LARGE", "ivf")
+VECTOR_INDEX_FLAT_MAX = int(os.getenv("VECTOR_INDEX_FLAT_MAX", "50000"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+# Question answering
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+QA_MAX_SEQ_LENGTH = int(os.getenv("QA_MAX_SEQ_LENGTH", "384"))
+QA_DOC_STRIDE = int(os.getenv("QA_DOC_STRIDE", "128"))
+QA_MAX_ANSWER_TOKENS = int(os.getenv("QA_MAX_ANSWER_TOKENS", "30"))
+# Windows per QA model forward pass, and limits for bulk requests
+QA_BATCH_SIZE = int(os.getenv("QA_BATCH_SIZE", "16"))
+MAX_BATCH_QUESTIONS = int(os.getenv("MAX_BATCH_QUESTIONS", "256"))
+MAX_CHALLENGE_QUESTIONS = int(os.getenv("MAX_CHALLENGE_QUESTIONS", "50"))
+
+# On-disk index cache; set INDEX_CACHE_MAX_BYTES=0 to disable it
+INDEX_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "indexes"))
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Upload ingestion
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 ** 2)))
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "2000"))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+# Number of chunks embedded and added to the index at a time
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# PDF extraction: "serial", "parallel", or "auto" (parallel for PDFs of at least PDF_PARALLEL_MIN_PAGES pages)
+PDF_EXTRACTION_MODE = os.getenv("PDF_EXTRACTION_MODE", "auto")
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# Pages taking longer are skipped; while this is set, serial extraction also runs in the pool
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", "10"))
+
+# Background upload jobs kept for status queries
+MAX_UPLOAD_JOBS = int(os.getenv("MAX_UPLOAD_JOBS", "256"))
+
+# Multi-worker serving (server.py): documents and upload jobs are shared between worker
+# processes through this directory; it needs the index cache, which holds the indexes
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR") or None
+
+# Answer and query embedding caches
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+
+# Challenge contexts are picked from at most this many chunks of a document
+DIVERSITY_POOL_SIZE = int(os.getenv("DIVERSITY_POOL_SIZE", "4096"))
+
+# Logging: "json" (one object per line) or "text"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Requests carrying this header get a Server-Timing breakdown of their processing stages
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+# With several server workers, how often each one copies its model, queue, cache and memory stats for /metrics
+METRICS_PUBLISH_SECONDS = float(os.getenv("METRICS_PUBLISH_SECONDS", "5"))
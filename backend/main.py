@@ -1,12 +1,60 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import Depends, FastAPI, UploadFile, File, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Callable, List, Optional, Set
+import asyncio
+import json
+import logging
 import uvicorn
 
-from models.document import DocumentResponse, QuestionRequest, QuestionResponse
+from config import (
+    DEFAULT_SESSION_ID,
+    INFERENCE_CONCURRENCY,
+    INFERENCE_MAX_QUEUE,
+    INFERENCE_RETRY_AFTER,
+    INFERENCE_WORKERS,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    MAX_CHALLENGE_QUESTIONS,
+    MAX_UPLOAD_BYTES,
+    MAX_UPLOAD_JOBS,
+    METRICS_PUBLISH_SECONDS,
+    PROFILE_HEADER,
+    SHARED_STATE_DIR,
+    UPLOAD_SPOOL_DIR,
+    WARMUP_MODELS,
+)
+from models.document import (
+    Answer,
+    BatchQuestionRequest,
+    DocumentInfo,
+    QuestionRequest,
+    QuestionResponse,
+    UploadJobResponse,
+)
 from services.document_processor import DocumentProcessor
-from services.qa_service import QAService
+from services.inference import InferenceExecutor, QueueFullError
+from services.ingestion import DocumentTooLargeError, SpooledUpload, spool_upload
+from services.jobs import JobManager, UploadJob
+from services.logging_config import configure_logging
+from services.metrics import (
+    CONTENT_TYPE_LATEST,
+    RequestMetricsMiddleware,
+    StatsCollector,
+    register_collector,
+    render_metrics,
+    stage,
+    start_profile,
+    start_stats_publisher,
+)
+from services.model_registry import ModelRegistry
+from services.pdf_extraction import shutdown_extraction_pool
+from services.qa_service import PendingAnswers, QAService
+from services.state import DocumentEntry, DocumentState
+from services.summary_tasks import SummaryTasks
+
+configure_logging(LOG_LEVEL, LOG_FORMAT)
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Document AI Assistant API")
 
@@ -17,15 +65,127 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-Id"],
 )
+app.add_middleware(RequestMetricsMiddleware, profile_header=PROFILE_HEADER)
 
-# Initialize services
+# Initialize services (models are loaded on first use and shared between them)
 document_processor = DocumentProcessor()
-qa_service = QAService()
+qa_service = QAService(document_processor)
+inference = InferenceExecutor(
+    max_workers=INFERENCE_WORKERS,
+    max_queue=INFERENCE_MAX_QUEUE,
+    model_concurrency=INFERENCE_CONCURRENCY,
+    retry_after=INFERENCE_RETRY_AFTER
+)
+upload_jobs = JobManager(MAX_UPLOAD_JOBS, SHARED_STATE_DIR)
+summary_tasks = SummaryTasks(inference, document_processor)
+# Keep references to running upload pipelines so they are not garbage collected
+running_uploads: Set[asyncio.Task] = set()
+
+register_collector(StatsCollector(
+    model_stats=ModelRegistry.stats,
+    inference_stats=inference.stats,
+    cache_stats=lambda: {
+        "answers": qa_service.answer_cache.stats(),
+        "query_embeddings": document_processor.query_embedding_cache.stats(),
+    },
+    document_stats=DocumentState.stats
+))
+
+@app.on_event("startup")
+def warm_up_models():
+    """Optionally load models before the first request (WARMUP_MODELS=all or a list of names)"""
+    if WARMUP_MODELS:
+        ModelRegistry.warm_up(WARMUP_MODELS)
+
+@app.on_event("startup")
+def publish_metrics():
+    # Runs in each server worker after fork; does nothing outside multiprocess mode
+    start_stats_publisher(METRICS_PUBLISH_SECONDS)
+
+@app.on_event("shutdown")
+def stop_inference():
+    inference.shutdown()
+    shutdown_extraction_pool()
+
+def get_session_id(x_session_id: Optional[str] = Header(None)) -> str:
+    """Identify the caller's session from the X-Session-Id header"""
+    return x_session_id or DEFAULT_SESSION_ID
+
+def service_unavailable(error: QueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def event_stream(events) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+async def index_upload(
+    upload: SpooledUpload,
+    session_id: str,
+    progress: Callable[[str, int, Optional[int]], None]
+) -> DocumentEntry:
+    """Index an upload, holding an embeddings slot only while a batch of chunks is embedded.
 
-@app.post("/upload", response_model=DocumentResponse)
-async def upload_document(file: UploadFile = File(...)):
-    """Upload and process a document (PDF/TXT)"""
+    Reading, extraction and chunking run under the separate "ingestion" limit,
+    so uploads do not keep questions waiting for the embedding model.
+    """
+    document = await inference.run_step("ingestion", document_processor.open_cached_upload, upload, session_id)
+    if document is not None:
+        return document
+    builder = document_processor.start_index(upload, progress)
+    while True:
+        batch = await inference.run_step("ingestion", builder.read_batch)
+        if batch is None:
+            break
+        await inference.run_step("embeddings", builder.embed_batch, batch)
+    return await inference.run_step("ingestion", document_processor.finish_index, builder, session_id)
+
+async def answer_pending(pending: PendingAnswers) -> List[Answer]:
+    """Fill in what the answer cache could not: retrieval under the embeddings limit, then the QA model"""
+    if not pending.complete:
+        pending = await inference.run("embeddings", qa_service.retrieve_pending, pending)
+    if not pending.complete:
+        await inference.run("qa_model", qa_service.finish_answers, pending)
+    return pending.answers
+
+async def run_upload_job(job: UploadJob, upload: SpooledUpload, summarize: bool = True):
+    """Index and summarize an upload in the background, reporting progress on the job"""
+    profile = start_profile()
+    try:
+        job.update(status="running")
+        try:
+            document = await index_upload(upload, job.session_id, job.report)
+        finally:
+            upload.cleanup()
+
+        # Questions can be asked as soon as the index is ready
+        job.update(doc_id=document.doc_id)
+        summary = document.summary
+        if summary is None and summarize:
+            summary = await summary_tasks.summarize(document, job.report)
+        job.update(status="completed", stage=None, summary=summary, timings=profile.stages())
+    except Exception as e:
+        logger.exception("Error in upload job %s: %s", job.job_id, e)
+        job.update(status="failed", error=str(e), timings=profile.stages())
+
+@app.post("/upload", response_model=UploadJobResponse, status_code=202)
+async def upload_document(
+    file: UploadFile = File(...),
+    summarize: bool = True,
+    session_id: str = Depends(get_session_id)
+):
+    """Upload a document (PDF/TXT) and start processing it in the background.
+
+    With ``summarize=false`` the job finishes once the document is indexed, and
+    the summary can be streamed from ``/documents/{doc_id}/summary/stream``.
+    """
     try:
         if not file or not file.filename:
             raise HTTPException(status_code=400, detail="No file provided")
@@ -34,55 +194,258 @@ async def upload_document(file: UploadFile = File(...)):
         if not file.filename.lower().endswith(('.pdf', '.txt')):
             raise HTTPException(status_code=400, detail="Only PDF and TXT files are supported")
         
-        # Process the document
-        doc_content = await document_processor.process_document(file)
-        summary = document_processor.generate_summary(doc_content)
+        if not inference.has_capacity():
+            raise QueueFullError(inference.retry_after)
+
+        # Stream the upload to disk, then process it off the request
+        with stage("spool"):
+            upload = await spool_upload(file, MAX_UPLOAD_BYTES, UPLOAD_SPOOL_DIR)
+        job = upload_jobs.create(file.filename, session_id)
+        task = asyncio.create_task(run_upload_job(job, upload, summarize))
+        running_uploads.add(task)
+        task.add_done_callback(running_uploads.discard)
         
-        return DocumentResponse(
-            filename=file.filename,
-            summary=summary,
-            success=True
-        )
+        return job.to_dict()
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise service_unavailable(e)
+    except DocumentTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def get_upload_job(job_id: str, session_id: str) -> UploadJob:
+    job = upload_jobs.get(job_id)
+    # Other sessions' jobs are reported as missing, like their documents
+    if not job or job.session_id != session_id:
+        raise HTTPException(status_code=404, detail=f"Upload job {job_id} was not found")
+    return job
+
+@app.get("/jobs/{job_id}", response_model=UploadJobResponse)
+async def upload_job_status(job_id: str, session_id: str = Depends(get_session_id)):
+    """Report the progress of an upload"""
+    return get_upload_job(job_id, session_id).to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def upload_job_events(job_id: str, request: Request, session_id: str = Depends(get_session_id)):
+    """Stream upload progress as server-sent events until the job finishes"""
+    job = get_upload_job(job_id, session_id)
+
+    async def events():
+        version = None
+        while not await request.is_disconnected():
+            # Jobs running on another worker are re-read from the shared state each time
+            current = upload_jobs.get(job_id) or job
+            if current.version != version:
+                state = current.to_dict()
+                version = state["version"]
+                event = state["status"] if current.finished else "progress"
+                yield sse_event(event, state)
+                if current.finished:
+                    break
+            await asyncio.sleep(0.25)
+
+    return event_stream(events())
+
+@app.get("/documents", response_model=List[DocumentInfo])
+async def list_documents(session_id: str = Depends(get_session_id)):
+    """List the documents uploaded in this session"""
+    return [
+        DocumentInfo(doc_id=entry.doc_id, filename=entry.filename)
+        for entry in DocumentState.list_documents(session_id)
+    ]
+
+@app.get("/documents/{doc_id}/summary/stream")
+async def stream_summary(doc_id: str, session_id: str = Depends(get_session_id)):
+    """Stream a document's summary as server-sent events.
+
+    Chunk summaries are sent as ``partial`` events as soon as each batch is
+    done, followed by the final ``summary``. Concurrent streams and the upload
+    job share one summarizer run, which stops once all of them have disconnected.
+    """
+    document = DocumentState.get_document(doc_id, session_id)
+    if not document:
+        raise HTTPException(status_code=404, detail=f"Document {doc_id} was not found")
+    if document.summary is None and not summary_tasks.running(doc_id) and not inference.has_capacity():
+        raise service_unavailable(QueueFullError(inference.retry_after))
+
+    async def events():
+        # Joins a summary already running for this document (e.g. its upload job) rather than starting another
+        summary_events = summary_tasks.follow(document)
+        try:
+            async for event, data in summary_events:
+                if event == "result":
+                    yield sse_event("summary", {"doc_id": doc_id, "summary": data})
+                else:
+                    yield sse_event(event, data)
+        except Exception as e:
+            logger.exception("Error in stream_summary: %s", e)
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            await summary_events.aclose()
+
+    return event_stream(events())
+
+@app.get("/models")
+async def model_stats():
+    """Report which models are loaded, how long they took and how much memory they use"""
+    return ModelRegistry.stats()
+
+@app.get("/inference")
+async def inference_stats():
+    """Report inference queue depth and wait times"""
+    return inference.stats()
+
+@app.get("/cache")
+async def cache_stats():
+    """Report answer and query embedding cache hit rates"""
+    return {
+        "answers": qa_service.answer_cache.stats(),
+        "query_embeddings": document_processor.query_embedding_cache.stats(),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage and request latency histograms, model, queue, cache and memory gauges"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 @app.post("/ask", response_model=QuestionResponse)
-async def ask_question(request: QuestionRequest):
-    """Answer a question based on the uploaded document"""
+async def ask_question(request: QuestionRequest, session_id: str = Depends(get_session_id)):
+    """Answer a question based on one uploaded document, or all of them if no doc_id is given"""
     try:
-        answer = qa_service.get_answer(request.question)
+        # Cached answers are returned without taking a model slot
+        pending = qa_service.lookup_answers([request.question], request.doc_id, session_id)
+        answer = (await answer_pending(pending))[0]
         return QuestionResponse(
             question=request.question,
             answer=answer.answer,
-            context=answer.context
+            context=answer.context,
+            doc_id=answer.doc_id or request.doc_id,
+            score=answer.score,
+            page=answer.page,
+            start=answer.start,
+            end=answer.end
+        )
+    except QueueFullError as e:
+        raise service_unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest, session_id: str = Depends(get_session_id)):
+    """Answer a question as server-sent events: the retrieved ``context`` first, then the ``answer``.
+
+    Disconnecting before the answer is ready stops the QA model.
+    """
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    if not inference.has_capacity():
+        raise service_unavailable(QueueFullError(inference.retry_after))
+
+    def answer_event(answer: Answer) -> str:
+        response = QuestionResponse(
+            question=request.question,
+            answer=answer.answer,
+            context=answer.context,
+            doc_id=answer.doc_id or request.doc_id,
+            score=answer.score,
+            page=answer.page,
+            start=answer.start,
+            end=answer.end
         )
+        return sse_event("answer", response.dict())
+
+    async def events():
+        try:
+            # Cached answers are sent without taking a model slot
+            pending = qa_service.lookup_answers([request.question], request.doc_id, session_id)
+            if not pending.complete:
+                pending = await inference.run("embeddings", qa_service.retrieve_pending, pending)
+            if pending.complete:
+                yield answer_event(pending.answers[0])
+                return
+            async for event, data in inference.stream("qa_model", qa_service.stream_answer, pending):
+                yield answer_event(data) if event == "result" else sse_event(event, data)
+        except Exception as e:
+            logger.exception("Error in ask_question_stream: %s", e)
+            yield sse_event("error", {"detail": str(e)})
+
+    return event_stream(events())
+
+@app.post("/ask/batch", response_model=List[QuestionResponse])
+async def ask_questions(request: BatchQuestionRequest, session_id: str = Depends(get_session_id)):
+    """Answer many questions, optionally about different documents, in one request"""
+    try:
+        groups = qa_service.lookup_batch(request.questions, session_id)
+        if not all(pending.complete for _, pending in groups):
+            groups = await inference.run("embeddings", qa_service.retrieve_batch, groups)
+        if all(pending.complete for _, pending in groups):
+            return qa_service.finish_batch(request.questions, groups)
+        return await inference.run("qa_model", qa_service.finish_batch, request.questions, groups)
+    except QueueFullError as e:
+        raise service_unavailable(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/challenge", response_model=List[QuestionResponse])
-async def generate_questions():
+async def generate_questions(
+    doc_id: Optional[str] = None,
+    num_questions: int = Query(3, ge=1, le=MAX_CHALLENGE_QUESTIONS),
+    session_id: str = Depends(get_session_id)
+):
     """Generate challenge questions based on the document"""
     try:
-        questions = qa_service.generate_questions()
+        # Picking passages and retrieving context need the embedding model, answering needs the QA model
+        contexts, pending = await inference.run(
+            "embeddings", qa_service.retrieve_challenge, num_questions, doc_id=doc_id, session_id=session_id
+        )
+        if pending.complete:
+            questions = qa_service.finish_challenge(contexts, pending)
+        else:
+            questions = await inference.run("qa_model", qa_service.finish_challenge, contexts, pending)
         if not questions:
             raise HTTPException(status_code=400, detail="Failed to generate questions")
         return questions
+    except QueueFullError as e:
+        raise service_unavailable(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/evaluate")
-async def evaluate_answer(question: str, user_answer: str):
-    """Evaluate a user's answer to a challenge question"""
+async def evaluate_answer(
+    question: str,
+    user_answer: str,
+    doc_id: Optional[str] = None,
+    reference_answer: Optional[str] = None,
+    context: Optional[str] = None,
+    session_id: str = Depends(get_session_id)
+):
+    """Evaluate a user's answer to a challenge question.
+
+    Pass back the challenge question's answer and context to skip re-running the QA model.
+    """
     try:
         if not question or not user_answer:
             raise HTTPException(status_code=400, detail="Question and answer are required")
             
-        evaluation = qa_service.evaluate_answer(question, user_answer)
+        if reference_answer is None:
+            answer = (await answer_pending(qa_service.lookup_answers([question], doc_id, session_id)))[0]
+            reference_answer, context = answer.answer, answer.context
+        evaluation = qa_service.evaluate_answer(
+            question, user_answer, doc_id, session_id, reference_answer, context
+        )
         return JSONResponse(content=evaluation)
+    except QueueFullError as e:
+        raise service_unavailable(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
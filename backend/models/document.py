@@ -1,22 +1,63 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List
 
-class DocumentResponse(BaseModel):
+class StageProgress(BaseModel):
+    done: int
+    total: Optional[int] = None
+
+class StageTiming(BaseModel):
+    seconds: float
+    count: int
+
+class UploadJobResponse(BaseModel):
+    job_id: str
+    filename: str
+    status: str
+    stage: Optional[str] = None
+    progress: Dict[str, StageProgress] = {}
+    doc_id: Optional[str] = None
+    summary: Optional[str] = None
+    error: Optional[str] = None
+    timings: Dict[str, StageTiming] = {}
+
+class DocumentInfo(BaseModel):
+    doc_id: str
     filename: str
-    summary: str
-    success: bool
+
+class Chunk(BaseModel):
+    text: str
+    page: Optional[int] = None
+    # Character offsets into the document text
+    start: int
+    end: int
+    token_count: int
 
 class Answer(BaseModel):
     answer: str
     context: str
+    score: Optional[float] = None
+    page: Optional[int] = None
+    doc_id: Optional[str] = None
+    # Character offsets of the answer in the document text
+    start: Optional[int] = None
+    end: Optional[int] = None
 
 class QuestionRequest(BaseModel):
     question: str
+    doc_id: Optional[str] = None
+
+class BatchQuestionRequest(BaseModel):
+    questions: List[QuestionRequest]
 
 class QuestionResponse(BaseModel):
     question: str
     answer: str
     context: Optional[str] = None
+    doc_id: Optional[str] = None
+    score: Optional[float] = None
+    page: Optional[int] = None
+    start: Optional[int] = None
+    end: Optional[int] = None
 
 class EvaluationResponse(BaseModel):
     is_correct: bool
@@ -0,0 +1,162 @@
+"""Production server: loads the models once, then forks uvicorn workers that share them.
+
+The parent process imports the app and loads the models before forking, so
+every worker shares the weights copy-on-write instead of loading its own copy.
+Workers accept connections from one listening socket, publish their documents
+and upload jobs to SHARED_STATE_DIR and read each other's indexes from the
+index cache, so requests need no sticky routing. Each worker holds its own
+copy of the vectors of the documents it has open. Metrics use
+prometheus_client's multiprocess mode, so /metrics reports all workers
+together whichever one answers. Run it from the backend directory:
+
+    python server.py --workers 4 --port 8000
+"""
+import argparse
+import gc
+import logging
+import os
+import shutil
+import signal
+import socket
+import time
+from typing import Dict
+
+logger = logging.getLogger("server")
+
+# Restarting a worker that keeps dying right away is throttled to this interval
+RESTART_INTERVAL = 1.0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        help="worker processes (default: WEB_CONCURRENCY or the number of CPUs)"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=None,
+        help="torch threads per worker (default: CPUs divided between the workers)"
+    )
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument(
+        "--shared-state-dir", default=os.getenv("SHARED_STATE_DIR") or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), ".cache", "shared"
+        ),
+        help="directory the workers share documents and upload jobs through"
+    )
+    return parser.parse_args()
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, threads: int):
+    """Serve requests in a forked worker until uvicorn shuts down"""
+    import torch
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    torch.set_num_threads(threads)
+    # Logging is already configured by the app; requests are logged by its middleware
+    config = uvicorn.Config(app, log_config=None, access_log=False, timeout_graceful_shutdown=30)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main():
+    args = parse_args()
+    if args.workers < 1:
+        raise SystemExit("--workers must be at least 1")
+
+    # Configuration is read when the app is imported
+    os.environ["SHARED_STATE_DIR"] = args.shared_state_dir
+    # Tokenizer thread pools do not survive fork; the workers parallelise instead
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # Workers write their metrics here so /metrics can add them up; it has to be set before
+    # prometheus_client is imported and must not hold files from an earlier run
+    metrics_dir = os.path.join(args.shared_state_dir, "metrics")
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+    import main as application
+    from config import WARMUP_MODELS
+    from prometheus_client.multiprocess import mark_process_dead
+    from services.model_registry import ModelRegistry
+
+    if not application.document_processor.index_cache.enabled:
+        raise SystemExit("Workers share indexes through the index cache; set INDEX_CACHE_MAX_BYTES above 0")
+
+    # ONNX Runtime sessions own thread pools that cannot be forked, so those load in each worker
+    ModelRegistry.warm_up([
+        name for name, stats in ModelRegistry.stats().items()
+        if stats.get("backend") != "onnx" and (not WARMUP_MODELS or "all" in WARMUP_MODELS or name in WARMUP_MODELS)
+    ])
+    sock = bind_socket(args.host, args.port, args.backlog)
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    # Keep the collector from touching (and so copying) the objects inherited by the workers
+    gc.freeze()
+
+    workers: Dict[int, float] = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(application.app, sock, threads)
+            except BaseException:
+                logger.exception("Worker %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        workers[pid] = time.monotonic()
+        logger.info("Started worker %d", pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info(
+        "Serving on %s:%d with %d workers of %d threads each", args.host, args.port, args.workers, threads
+    )
+    for _ in range(args.workers):
+        spawn()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = workers.pop(pid, None)
+        # Drop the worker's per-process gauges; its counters and histograms still count
+        mark_process_dead(pid)
+        if started is None or stopping:
+            continue
+        logger.warning("Worker %d exited with status %d; restarting it", pid, os.waitstatus_to_exitcode(status))
+        time.sleep(max(0.0, RESTART_INTERVAL - (time.monotonic() - started)))
+        spawn()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import json
+import os
+import re
+from typing import Any, List, Optional
+
+import torch
+from langchain_core.embeddings import Embeddings
+
+from config import INFERENCE_BACKEND, MODEL_BACKENDS, ONNX_EXPORT_DIR
+
+BACKENDS = ("torch", "quantized", "onnx")
+
+
+def backend_for(name: str) -> str:
+    """The configured backend for a registry model name"""
+    backend = MODEL_BACKENDS.get(name, INFERENCE_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend for {name}: {backend} (expected one of {', '.join(BACKENDS)})")
+    return backend
+
+
+def quantize(module: torch.nn.Module) -> torch.nn.Module:
+    """Dynamically quantize a model's linear layers to int8 for CPU inference"""
+    return torch.quantization.quantize_dynamic(module.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_onnx(model_class: str, model_name: str) -> Any:
+    """Load an ONNX Runtime model, exporting and saving it on first use"""
+    try:
+        import optimum.onnxruntime as ort
+    except ImportError as e:
+        raise ImportError(
+            "The onnx backend needs optimum and onnxruntime: pip install optimum[onnxruntime]"
+        ) from e
+
+    cls = getattr(ort, model_class)
+    export_dir = os.path.join(ONNX_EXPORT_DIR, model_class, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+    if os.path.isdir(export_dir) and any(name.endswith(".onnx") for name in os.listdir(export_dir)):
+        return cls.from_pretrained(export_dir)
+
+    model = cls.from_pretrained(model_name, export=True)
+    model.save_pretrained(export_dir)
+    return model
+
+
+def load_qa_model(model_name: str, backend: str) -> Any:
+    """Extractive QA model; every backend returns ``start_logits``/``end_logits`` tensors"""
+    if backend == "onnx":
+        return _load_onnx("ORTModelForQuestionAnswering", model_name)
+
+    from transformers import AutoModelForQuestionAnswering
+    model = AutoModelForQuestionAnswering.from_pretrained(model_name)
+    return quantize(model) if backend == "quantized" else model
+
+
+def load_summarizer(model_name: str, backend: str) -> Any:
+    """Summarization pipeline running on the given backend"""
+    from transformers import AutoTokenizer
+    from transformers.pipelines import pipeline
+
+    if backend == "onnx":
+        model = _load_onnx("ORTModelForSeq2SeqLM", model_name)
+        return pipeline("summarization", model=model, tokenizer=AutoTokenizer.from_pretrained(model_name))
+
+    summarizer = pipeline("summarization", model=model_name)
+    if backend == "quantized":
+        summarizer.model = quantize(summarizer.model)
+    return summarizer
+
+
+def load_embeddings(model_name: str, backend: str) -> Embeddings:
+    """Sentence embeddings running on the given backend"""
+    if backend == "onnx":
+        return OnnxEmbeddings(model_name)
+
+    from langchain_community.embeddings.huggingface import HuggingFaceEmbeddings
+    embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    if backend == "quantized":
+        embeddings.client = quantize(embeddings.client)
+    return embeddings
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an ONNX Runtime export of a sentence-transformers model.
+
+    Pooling (mean or CLS token) and normalization follow the model's
+    sentence-transformers configuration, so vectors match the torch backend.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        from transformers import AutoTokenizer
+
+        self.model = _load_onnx("ORTModelForFeatureExtraction", model_name)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.max_length = min(self.tokenizer.model_max_length, 512)
+        self.batch_size = batch_size
+
+        modules = _read_sentence_transformers_config(model_name, "modules.json") or []
+        pooling = _read_sentence_transformers_config(model_name, "1_Pooling/config.json") or {}
+        self.cls_pooling = bool(pooling.get("pooling_mode_cls_token"))
+        self.normalize = any(module.get("type", "").endswith(".Normalize") for module in modules)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed(texts[start:start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="pt"
+        )
+        with torch.no_grad():
+            tokens = self.model(
+                input_ids=encoded["input_ids"], attention_mask=encoded["attention_mask"]
+            ).last_hidden_state
+        if self.cls_pooling:
+            pooled = tokens[:, 0]
+        else:
+            mask = encoded["attention_mask"].unsqueeze(-1).to(tokens.dtype)
+            pooled = (tokens * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        if self.normalize:
+            pooled = torch.nn.functional.normalize(pooled, dim=1)
+        return pooled.tolist()
+
+
+def _read_sentence_transformers_config(model_name: str, filename: str) -> Optional[Any]:
+    """Read a JSON file from a sentence-transformers model directory or the hub"""
+    from sentence_transformers.util import load_file_path
+
+    path = load_file_path(model_name, filename, token=None, cache_folder=None)
+    if not path:
+        return None
+    with open(path) as config:
+        return json.load(config)
@@ -0,0 +1,84 @@
+import re
+from bisect import bisect_left
+from typing import List, Optional
+
+from transformers import PreTrainedTokenizerBase
+
+from models.document import Chunk
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = ".!?"
+
+
+class TokenChunker:
+    """Splits text into chunks of at most ``max_tokens`` tokenizer tokens.
+
+    Each page is tokenized once. Chunks end at the last paragraph break that
+    leaves them at least half full, otherwise at the last sentence end, and
+    only cut mid-sentence when neither exists. Consecutive chunks share up to
+    ``overlap_tokens`` tokens, but the overlap never reaches back across a
+    paragraph break. Offsets are relative to the whole document, so chunks,
+    answers and the stored document text line up exactly.
+    """
+
+    def __init__(self, tokenizer: PreTrainedTokenizerBase, max_tokens: int, overlap_tokens: int = 0):
+        self.tokenizer = tokenizer
+        self.max_tokens = max(1, max_tokens)
+        # Keep the overlap well below the minimum chunk length so every chunk makes progress
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 4))
+
+    def split(self, text: str, page: Optional[int] = None, offset: int = 0) -> List[Chunk]:
+        """Chunk one page of text that starts at ``offset`` in the document"""
+        encoding = self.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False
+        )
+        # Zero-width tokens (e.g. a lone space marker) still take up room in the model window
+        spans = [tuple(span) for span in encoding["offset_mapping"]]
+        if not spans or not text.strip():
+            return []
+
+        # Token indices that start a new paragraph
+        token_starts = [start for start, _ in spans]
+        breaks = sorted({
+            bisect_left(token_starts, match.end()) for match in PARAGRAPH_BREAK.finditer(text)
+        } - {0, len(spans)})
+
+        chunks = []
+        start = 0
+        while start < len(spans):
+            end = min(start + self.max_tokens, len(spans))
+            if end < len(spans):
+                end = self._cut(text, spans, breaks, start, end)
+            chunk_text = text[spans[start][0]:spans[end - 1][1]]
+            if chunk_text.strip():
+                chunks.append(Chunk(
+                    text=chunk_text,
+                    page=page,
+                    start=offset + spans[start][0],
+                    end=offset + spans[end - 1][1],
+                    token_count=end - start
+                ))
+            if end >= len(spans):
+                break
+
+            next_start = max(end - self.overlap_tokens, start + 1)
+            # Start the next chunk on the paragraph that begins inside the overlap, if any
+            i = bisect_left(breaks, next_start)
+            if i < len(breaks) and breaks[i] <= end:
+                next_start = breaks[i]
+            start = next_start
+        return chunks
+
+    def _cut(self, text: str, spans: list, breaks: List[int], start: int, end: int) -> int:
+        """Pick where a full chunk ends: a paragraph break, a sentence end, or ``end``"""
+        floor = start + max(1, self.max_tokens // 2)
+        i = bisect_left(breaks, end + 1) - 1
+        if i >= 0 and breaks[i] > floor:
+            return breaks[i]
+        for token in range(end - 1, floor - 1, -1):
+            if text[spans[token][1] - 1] in SENTENCE_END:
+                return token + 1
+        return end
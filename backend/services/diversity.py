@@ -0,0 +1,52 @@
+from typing import List
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale every row to unit length so dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def maximal_marginal_relevance(
+    query_vectors: np.ndarray,
+    candidate_vectors: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """Pick ``k`` candidates that are relevant to any query but unlike each other.
+
+    Relevance is a candidate's best cosine similarity to any of the queries.
+    Each step picks the candidate maximizing
+    ``lambda_mult * relevance - (1 - lambda_mult) * similarity to the picks so far``.
+    Only one matrix-vector product is needed per pick, so the cost is
+    ``O(k * candidates * dim)``.
+
+    Args:
+        query_vectors: ``(queries, dim)`` query embeddings
+        candidate_vectors: ``(candidates, dim)`` chunk embeddings
+        k: number of candidates to select
+        lambda_mult: trade-off between relevance (1.0) and diversity (0.0)
+
+    Returns:
+        Indices into ``candidate_vectors`` in selection order.
+    """
+    candidates = normalize_rows(candidate_vectors)
+    k = min(k, len(candidates))
+    if k <= 0:
+        return []
+
+    relevance = (candidates @ normalize_rows(query_vectors).T).max(axis=1)
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    selected: List[int] = []
+    for _ in range(k):
+        if selected:
+            redundancy = np.maximum(redundancy, candidates @ candidates[selected[-1]])
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        else:
+            scores = relevance.copy()
+        scores[selected] = -np.inf
+        selected.append(int(scores.argmax()))
+    return selected
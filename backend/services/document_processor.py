@@ -1,97 +1,458 @@
-import PyPDF2
-from fastapi import UploadFile
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.embeddings.huggingface import HuggingFaceEmbeddings
+import logging
+import threading
+
+import numpy as np
 from langchain_community.vectorstores.faiss import FAISS
-from transformers.pipelines import pipeline
-from io import BytesIO
-from typing import Optional
-from .state import DocumentState
+from langchain_core.documents import Document
+from transformers.pipelines import SummarizationPipeline
+from typing import Callable, List, Optional, Tuple
+from config import (
+    BM25_B,
+    BM25_K1,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_TOKENS,
+    DEFAULT_SESSION_ID,
+    DENSE_WEIGHT,
+    DIVERSITY_POOL_SIZE,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MODEL,
+    HYBRID_CANDIDATES,
+    INDEX_CACHE_DIR,
+    INDEX_CACHE_MAX_BYTES,
+    LEXICAL_SKIP_RATIO,
+    LEXICAL_WEIGHT,
+    MAX_PDF_PAGES,
+    QA_MODEL,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    RETRIEVAL_MODE,
+    RRF_K,
+    SHARED_STATE_DIR,
+    SUMMARIZER_MODEL,
+    SUMMARY_BATCH_SIZE,
+    SUMMARY_CHUNK_TOKENS,
+)
+from models.document import Chunk
+from .backends import backend_for
+from .cache import CachedQueryEmbeddings, LRUCache
+from .chunking import TokenChunker
+from .diversity import maximal_marginal_relevance
+from .index_cache import IndexCache
+from .inference import InferenceCancelled
+from .lexical_index import LexicalIndex, is_confident, reciprocal_rank_fusion
+from .metrics import stage, timed_iter
+from .ingestion import SpooledUpload, count_pages, iter_pages
+from .model_registry import ModelRegistry
+from .shared_state import SharedDocumentRegistry
+from .state import DocumentEntry, DocumentState
+from .summarizer import MapReduceSummarizer
+from .vector_store import Store, search_store, store_document, store_ids, store_size, store_vectors
+
+logger = logging.getLogger(__name__)
+
+# Separator between pages in the stored document text; chunk offsets account for it
+PAGE_SEPARATOR = "\n\n"
 
 class DocumentProcessor:
     def __init__(self):
-        self.text_splitter = CharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        self.embeddings = HuggingFaceEmbeddings()
-        self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
+        self._chunker: Optional[TokenChunker] = None
         self.state = DocumentState()
+        self.query_embedding_cache = LRUCache(QUERY_EMBEDDING_CACHE_SIZE)
+        self._embeddings = CachedQueryEmbeddings(
+            lambda: ModelRegistry.get("embeddings"), self.query_embedding_cache
+        )
+        # Anything that changes the chunks, vectors or summary must be part of the cache key
+        self.index_cache = IndexCache(
+            INDEX_CACHE_DIR,
+            INDEX_CACHE_MAX_BYTES,
+            fingerprint="|".join([
+                EMBEDDING_MODEL,
+                f"embedding_backend={backend_for('embeddings')}",
+                f"chunk_tokens={CHUNK_TOKENS}",
+                f"chunk_overlap_tokens={CHUNK_OVERLAP_TOKENS}",
+                f"chunk_tokenizer={QA_MODEL}",
+                "split=tokens,metadata=page,start,end,token_count",
+                SUMMARIZER_MODEL,
+                f"summarizer_backend={backend_for('summarizer')}",
+                f"summary_chunk_tokens={SUMMARY_CHUNK_TOKENS}",
+            ])
+        )
+        if SHARED_STATE_DIR and self.index_cache.enabled:
+            # Workers publish documents to each other and open them from the shared index cache
+            self.state.share(
+                SharedDocumentRegistry(SHARED_STATE_DIR, self.state.idle_seconds), self.load_shared_document
+            )
 
-    async def process_document(self, file: UploadFile) -> str:
-        """Process uploaded document and return its content"""
-        if not file or not file.filename:
-            raise ValueError("No file provided")
-            
-        content = await self._read_file(file)
-        
-        # Split text into chunks and create vector store
-        chunks = self.text_splitter.split_text(content)
-        vector_store = FAISS.from_texts(chunks, self.embeddings)
-        
-        # Update shared state
-        self.state.set_vector_store(vector_store)
-        self.state.set_current_document(content)
-        
-        return content
-
-    async def _read_file(self, file: UploadFile) -> str:
-        """Read content from PDF or TXT file"""
-        content = ""
-        if file.filename and file.filename.lower().endswith('.pdf'):
-            # Read PDF file
-            pdf_bytes = await file.read()
-            pdf_reader = PyPDF2.PdfReader(BytesIO(pdf_bytes))
-            for page in pdf_reader.pages:
-                content += page.extract_text()
-        else:
-            # Read TXT file
-            content = (await file.read()).decode('utf-8')
-        
-        return content
+    @property
+    def embeddings(self) -> CachedQueryEmbeddings:
+        return self._embeddings
+
+    @property
+    def chunker(self) -> TokenChunker:
+        """Token-sized chunks measured with the QA tokenizer, so each fits the QA window"""
+        if self._chunker is None:
+            self._chunker = TokenChunker(ModelRegistry.get("chunk_tokenizer"), CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS)
+        return self._chunker
+
+    @property
+    def summarizer(self) -> SummarizationPipeline:
+        return ModelRegistry.get("summarizer")
+
+    def index_upload(
+        self,
+        upload: SpooledUpload,
+        session_id: str = DEFAULT_SESSION_ID,
+        progress: Optional[Callable[[str, int, Optional[int]], None]] = None
+    ) -> DocumentEntry:
+        """Extract, embed and register a spooled upload for the session.
+
+        Documents seen before (same bytes and configuration) are loaded from
+        the index cache without being read at all. Otherwise pages are streamed
+        through the chunker and embedded in batches of EMBEDDING_BATCH_SIZE
+        chunks, so only a window of the document is being processed at a time.
+        This blocks; the upload job runs the same steps itself so that only
+        embedding takes an embeddings slot. ``progress`` receives
+        ``(stage, done, total)`` updates as pages are extracted and chunks are
+        embedded.
+        """
+        entry = self.open_cached_upload(upload, session_id)
+        if entry is not None:
+            return entry
+        builder = self.start_index(upload, progress)
+        while True:
+            batch = builder.read_batch()
+            if batch is None:
+                break
+            builder.embed_batch(batch)
+        return self.finish_index(builder, session_id)
+
+    def open_cached_upload(self, upload: SpooledUpload, session_id: str = DEFAULT_SESSION_ID) -> Optional[DocumentEntry]:
+        """Register an upload indexed before from the index cache, if it is there"""
+        doc_id = self.state.new_document_id()
+        with stage("cache_load"):
+            cached = self.index_cache.load(self.index_cache.key(upload.content_hash), self.embeddings, doc_id)
+        if not cached:
+            return None
+        # The lexical index is rebuilt from the cached chunks when the document is registered
+        vector_store, content = cached
+        return self._register(doc_id, session_id, upload, vector_store, content, None)
+
+    def start_index(
+        self,
+        upload: SpooledUpload,
+        progress: Optional[Callable[[str, int, Optional[int]], None]] = None
+    ) -> "IndexBuilder":
+        return IndexBuilder(self, upload, self.state.new_document_id(), progress)
 
-    def generate_summary(self, text: str) -> str:
-        """Generate a summary of the document"""
+    def finish_index(self, builder: "IndexBuilder", session_id: str = DEFAULT_SESSION_ID) -> DocumentEntry:
+        """Cache and register a fully embedded upload"""
+        if builder.vector_store is None:
+            raise ValueError("No text could be extracted from the document")
+        content = PAGE_SEPARATOR.join(builder.pages)
+        with stage("cache_save"):
+            self.index_cache.save(self.index_cache.key(builder.upload.content_hash), builder.vector_store, content)
+        return self._register(
+            builder.doc_id, session_id, builder.upload, builder.vector_store, content, builder.lexical_index
+        )
+
+    def load_shared_document(self, record: dict) -> Optional[DocumentEntry]:
+        """Open a document another worker indexed from its index cache entry"""
+        cache_key = self.index_cache.key(record["content_hash"])
+        with stage("cache_load"):
+            cached = self.index_cache.load(cache_key, self.embeddings, record["doc_id"])
+        if not cached:
+            # Evicted from the cache since; the user has to upload it again
+            return None
+        vector_store, content = cached
+        entry = DocumentEntry(
+            record["doc_id"], record["session_id"], record["filename"], content, vector_store, record["content_hash"]
+        )
+        entry.created_at = record["created_at"]
+        entry.summary = self.index_cache.load_summary(cache_key)
+        return entry
+
+    def _register(
+        self,
+        doc_id: str,
+        session_id: str,
+        upload: SpooledUpload,
+        vector_store: FAISS,
+        content: str,
+        lexical_index: Optional[LexicalIndex]
+    ) -> DocumentEntry:
+        """Register the document in the shared state"""
+        entry = DocumentEntry(doc_id, session_id, upload.filename, content, vector_store, upload.content_hash)
+        entry.lexical_index = lexical_index
+        entry.summary = self.index_cache.load_summary(self.index_cache.key(upload.content_hash))
+        return self.state.add_document(entry)
+
+    def get_summary(
+        self,
+        document: DocumentEntry,
+        progress: Optional[Callable[[str, int, Optional[int]], None]] = None,
+        on_partial: Optional[Callable[[str, List[str]], None]] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> str:
+        """Summarize a document, reusing a cached summary when there is one"""
+        if not document.summary:
+            # Another worker may have summarized it since it was loaded here
+            document.summary = self.index_cache.load_summary(self.index_cache.key(document.content_hash))
+        if document.summary:
+            return document.summary
+
+        with stage("summarize"):
+            summary = self.generate_summary(
+                document.content, progress, self.get_chunks(document), on_partial, cancelled
+            )
+        if summary != "Failed to generate summary.":
+            document.summary = summary
+            self.index_cache.save_summary(self.index_cache.key(document.content_hash), summary)
+        return summary
+
+    def get_chunks(self, document: DocumentEntry) -> Optional[List[Chunk]]:
+        """The chunks a document was indexed with, in document order"""
+        store = document.vector_store
+        docs = [store.docstore.search(store.index_to_docstore_id[i]) for i in range(store.index.ntotal)]
+        if not docs or any("start" not in doc.metadata for doc in docs):
+            return None
+        return sorted(
+            (Chunk(text=doc.page_content, **{k: v for k, v in doc.metadata.items() if k != "doc_id"}) for doc in docs),
+            key=lambda chunk: chunk.start
+        )
+
+    def generate_summary(
+        self,
+        text: str,
+        progress: Optional[Callable[[str, int, Optional[int]], None]] = None,
+        chunks: Optional[List[Chunk]] = None,
+        on_partial: Optional[Callable[[str, List[str]], None]] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> str:
+        """Generate a summary of the document, from its indexed chunks when given"""
         try:
-            # Split text into chunks that fit within model's max input length
-            chunks = self.text_splitter.split_text(text)
-            
-            # Generate summary for each chunk
-            chunk_summaries = []
-            for chunk in chunks:
-                summary_output = self.summarizer(chunk, max_length=150, min_length=30, do_sample=False)
-                if summary_output and isinstance(summary_output, list) and summary_output[0]:
-                    chunk_summaries.append(summary_output[0]['summary_text'])
-            
-            if not chunk_summaries:
-                return "Failed to generate summary."
-            
-            # If we have multiple chunk summaries, combine them
-            if len(chunk_summaries) > 1:
-                # Join all summaries and generate a final summary
-                combined_summary = " ".join(chunk_summaries)
-                final_summary = self.summarizer(
-                    combined_summary,
-                    max_length=150,
-                    min_length=50,
-                    do_sample=False
-                )
-                if final_summary and isinstance(final_summary, list) and final_summary[0]:
-                    return final_summary[0]['summary_text']
-            
-            # If we only have one summary or final summarization failed
-            return chunk_summaries[0]
-            
+            summarizer = MapReduceSummarizer(
+                self.summarizer,
+                batch_size=SUMMARY_BATCH_SIZE,
+                chunk_tokens=SUMMARY_CHUNK_TOKENS,
+                on_partial=on_partial,
+                cancelled=cancelled
+            )
+            if chunks:
+                summary = summarizer.summarize_chunks(text, chunks, progress)
+            else:
+                summary = summarizer.summarize(text, progress)
+            return summary or "Failed to generate summary."
+        except InferenceCancelled:
+            raise
         except Exception as e:
-            print(f"Error in generate_summary: {str(e)}")
+            logger.exception("Error in generate_summary: %s", e)
             return "Failed to generate summary."
 
-    def get_relevant_context(self, question: str, k: int = 3) -> str:
-        """Retrieve relevant context for a question"""
-        vector_store = self.state.get_vector_store()
+    def get_vector_store(self, doc_id: Optional[str] = None, session_id: str = DEFAULT_SESSION_ID) -> Store:
+        """Get the index for one document, or the session-wide index when no doc_id is given"""
+        if doc_id:
+            entry = self.state.get_document(doc_id, session_id)
+            if not entry:
+                raise ValueError(f"Document {doc_id} was not found. Please upload it again.")
+            return entry.vector_store
+
+        vector_store = self.state.get_session_store(session_id)
         if not vector_store:
-            raise ValueError("No document has been processed yet")
-        
-        docs = vector_store.similarity_search(question, k=k)
-        return " ".join([doc.page_content for doc in docs]) 
\ No newline at end of file
+            raise ValueError("No document has been uploaded yet. Please upload a document first.")
+        return vector_store
+
+    def get_relevant_documents(
+        self,
+        question: str,
+        k: int = 3,
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> List[Document]:
+        """Retrieve the chunks most relevant to a question with their metadata, best first"""
+        return self.get_relevant_documents_batch([question], k, doc_id, session_id)[0]
+
+    @stage("retrieve")
+    def get_relevant_documents_batch(
+        self,
+        questions: List[str],
+        k: int = 3,
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> List[List[Document]]:
+        """Retrieve the most relevant chunks for several questions.
+
+        In hybrid mode each question's BM25 and dense rankings are merged with
+        reciprocal rank fusion. Questions whose best BM25 hit clearly beats the
+        rest (``LEXICAL_SKIP_RATIO``) are answered from the lexical index alone,
+        and the remaining questions are embedded in one batch and searched
+        together.
+        """
+        vector_store = self.get_vector_store(doc_id, session_id)
+        size = store_size(vector_store)
+        if not questions or not size:
+            return [[] for _ in questions]
+
+        depth = min(max(k, HYBRID_CANDIDATES), size)
+        lexical_index = self.get_lexical_index(doc_id, session_id) if RETRIEVAL_MODE != "dense" else None
+        with stage("lexical_search"):
+            scored_hits = [lexical_index.search(question, depth) if lexical_index else [] for question in questions]
+        lexical_hits = [[position for position, _ in hits] for hits in scored_hits]
+
+        # Dense search only for the questions the lexical index cannot settle
+        dense_needed = [
+            i for i, hits in enumerate(scored_hits)
+            if not hits or (RETRIEVAL_MODE != "lexical" and not is_confident(hits, LEXICAL_SKIP_RATIO, k))
+        ]
+        dense_hits = {}
+        if dense_needed:
+            with stage("embed_query"):
+                query_vectors = np.array(
+                    self.embeddings.embed_queries([questions[i] for i in dense_needed]), dtype=np.float32
+                )
+            with stage("vector_search"):
+                neighbours = search_store(vector_store, query_vectors, depth)
+            dense_hits = {i: [int(p) for p in row if p >= 0] for i, row in zip(dense_needed, neighbours)}
+
+        results = []
+        for i, lexical in enumerate(lexical_hits):
+            if i not in dense_hits:
+                positions = lexical
+            elif not lexical:
+                positions = dense_hits[i]
+            else:
+                positions = reciprocal_rank_fusion([dense_hits[i], lexical], [DENSE_WEIGHT, LEXICAL_WEIGHT], RRF_K)
+            results.append([store_document(vector_store, position) for position in positions[:k]])
+        return results
+
+    def get_lexical_index(self, doc_id: Optional[str] = None, session_id: str = DEFAULT_SESSION_ID) -> Optional[LexicalIndex]:
+        """The BM25 index matching ``get_vector_store``, or None if it is out of step with it"""
+        vector_store = self.get_vector_store(doc_id, session_id)
+        if doc_id:
+            lexical_index = self.state.get_document(doc_id, session_id).lexical_index
+        else:
+            lexical_index = self.state.get_session_lexical(session_id)
+        if lexical_index is None or len(lexical_index) != store_size(vector_store):
+            return None
+        return lexical_index
+
+    def get_diverse_documents(
+        self,
+        queries: List[str],
+        k: int,
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID,
+        lambda_mult: float = 0.5
+    ) -> List[Document]:
+        """Select ``k`` chunks that match the queries while covering different parts of the text.
+
+        Chunk vectors are read back from the FAISS index instead of being
+        embedded again and the queries are embedded in one batch. Documents with
+        more than ``DIVERSITY_POOL_SIZE`` chunks are narrowed down to the
+        nearest neighbours of the queries first, with one multi-query search.
+        """
+        vector_store = self.get_vector_store(doc_id, session_id)
+        if not store_size(vector_store) or k <= 0:
+            return []
+
+        query_vectors = np.array(self.embeddings.embed_queries(queries), dtype=np.float32)
+        if store_size(vector_store) <= DIVERSITY_POOL_SIZE:
+            ids = store_ids(vector_store)
+        else:
+            per_query = max(k, DIVERSITY_POOL_SIZE // len(queries))
+            neighbours = search_store(vector_store, query_vectors, per_query)
+            ids = np.unique(neighbours[neighbours >= 0])
+        vectors = store_vectors(vector_store, ids)
+
+        picks = maximal_marginal_relevance(query_vectors, vectors, k, lambda_mult)
+        return [store_document(vector_store, ids[i]) for i in picks]
+
+    def get_relevant_chunks(
+        self,
+        question: str,
+        k: int = 3,
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> List[str]:
+        """Retrieve the chunks most relevant to a question, best first"""
+        docs = self.get_relevant_documents(question, k, doc_id, session_id)
+        return [doc.page_content for doc in docs]
+
+    def get_relevant_context(
+        self,
+        question: str,
+        k: int = 3,
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> str:
+        """Retrieve relevant context for a question"""
+        return " ".join(self.get_relevant_chunks(question, k, doc_id, session_id))
+ 
+
+class IndexBuilder:
+    """Builds an upload's vector and lexical indexes one embedding batch at a time.
+
+    ``read_batch`` extracts and chunks pages until EMBEDDING_BATCH_SIZE chunks
+    are ready, and ``embed_batch`` embeds and indexes them, so the two can run
+    under different model slots. Call them in turn, never concurrently.
+    """
+
+    def __init__(
+        self,
+        processor: DocumentProcessor,
+        upload: SpooledUpload,
+        doc_id: str,
+        progress: Optional[Callable[[str, int, Optional[int]], None]] = None
+    ):
+        self.processor = processor
+        self.upload = upload
+        self.doc_id = doc_id
+        self.progress = progress
+        self.vector_store: Optional[FAISS] = None
+        self.lexical_index = LexicalIndex(BM25_K1, BM25_B)
+        self.pages: List[str] = []
+        self._pages = None
+        self._total_pages: Optional[int] = None
+        self._offset = 0
+        self._embedded = 0
+
+    def read_batch(self) -> Optional[Tuple[List[str], List[dict]]]:
+        """The next chunk texts and metadata to embed, or None once the document is read"""
+        if self._pages is None:
+            self._total_pages = count_pages(self.upload)
+            self._pages = timed_iter("read", iter_pages(self.upload, MAX_PDF_PAGES))
+        texts: List[str] = []
+        metadatas: List[dict] = []
+        for page_number, page_text in self._pages:
+            if self.pages:
+                self._offset += len(PAGE_SEPARATOR)
+            self.pages.append(page_text)
+            # Text files have no pages, only PDF chunks can cite one
+            with stage("split"):
+                chunks = self.processor.chunker.split(
+                    page_text, page_number if self.upload.is_pdf else None, self._offset
+                )
+            self._offset += len(page_text)
+            for chunk in chunks:
+                texts.append(chunk.text)
+                metadata = chunk.dict(exclude={"text"}, exclude_none=True)
+                metadatas.append({"doc_id": self.doc_id, **metadata})
+            if self.progress:
+                self.progress("extracting", len(self.pages), self._total_pages)
+            if len(texts) >= EMBEDDING_BATCH_SIZE:
+                break
+        return (texts, metadatas) if texts else None
+
+    def embed_batch(self, batch: Tuple[List[str], List[dict]]):
+        texts, metadatas = batch
+        embeddings = self.processor.embeddings
+        with stage("embed"):
+            vectors = embeddings.embed_documents(texts)
+        with stage("index"):
+            text_embeddings = list(zip(texts, vectors))
+            if self.vector_store is None:
+                self.vector_store = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas)
+            else:
+                self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas)
+            self.lexical_index.add(texts)
+        self._embedded += len(texts)
+        if self.progress:
+            self.progress("embedding", self._embedded, None)
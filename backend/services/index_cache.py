@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.faiss import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"
+CONTENT_FILE = "content.txt"
+SUMMARY_FILE = "summary.txt"
+
+
+class IndexCache:
+    """Content-addressed, on-disk cache of document indexes.
+
+    Entries are keyed by a hash of the uploaded bytes plus the processing
+    configuration, so re-uploading a known document skips embedding entirely
+    and entries survive restarts. Loading reads the FAISS index into memory:
+    document indexes are flat, and FAISS cannot memory-map flat indexes. The
+    least recently used entries are evicted once the cache grows past
+    ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, fingerprint: str = ""):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key(self, content_hash: str) -> str:
+        """Cache key for a document's content under the current configuration"""
+        return hashlib.sha256(f"{content_hash}|{self.fingerprint}".encode("utf-8")).hexdigest()
+
+    def load(self, key: str, embeddings: Embeddings, doc_id: str) -> Optional[Tuple[FAISS, str]]:
+        """Load a cached index and the document text, or None on a miss"""
+        path = self._path(key)
+        if not self.enabled or not os.path.isdir(path):
+            return None
+
+        try:
+            index = faiss.read_index(os.path.join(path, INDEX_FILE))
+            with open(os.path.join(path, CHUNKS_FILE), encoding="utf-8") as f:
+                chunks = json.load(f)
+            with open(os.path.join(path, CONTENT_FILE), encoding="utf-8") as f:
+                content = f.read()
+        except (OSError, ValueError, RuntimeError) as e:
+            logger.exception("Error loading cached index %s: %s", key, e)
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+        # Chunks are stored without per-upload metadata; tag them with the new doc_id
+        ids = [str(i) for i in range(len(chunks))]
+        docstore = InMemoryDocstore({
+            chunk_id: Document(page_content=chunk["text"], metadata={**chunk.get("metadata", {}), "doc_id": doc_id})
+            for chunk_id, chunk in zip(ids, chunks)
+        })
+        vector_store = FAISS(embeddings, index, docstore, dict(enumerate(ids)))
+
+        os.utime(path)
+        return vector_store, content
+
+    def save(self, key: str, vector_store: FAISS, content: str):
+        """Persist an index, its chunks and the document text"""
+        if not self.enabled or os.path.isdir(self._path(key)):
+            return
+
+        chunks = [self._chunk_record(vector_store.docstore.search(vector_store.index_to_docstore_id[i]))
+                  for i in range(vector_store.index.ntotal)]
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.cache_dir, prefix=".staging-")
+        try:
+            faiss.write_index(vector_store.index, os.path.join(staging, INDEX_FILE))
+            with open(os.path.join(staging, CHUNKS_FILE), "w", encoding="utf-8") as f:
+                json.dump(chunks, f)
+            with open(os.path.join(staging, CONTENT_FILE), "w", encoding="utf-8") as f:
+                f.write(content)
+            # Publish atomically so readers never see a partial entry
+            os.rename(staging, self._path(key))
+        except OSError as e:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(self._path(key)):
+                logger.exception("Error saving cached index %s: %s", key, e)
+            return
+
+        self._evict()
+
+    def load_summary(self, key: str) -> Optional[str]:
+        path = os.path.join(self._path(key), SUMMARY_FILE)
+        if not self.enabled or not os.path.isfile(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def save_summary(self, key: str, summary: str):
+        path = self._path(key)
+        if not self.enabled or not os.path.isdir(path):
+            return
+        fd, staging = tempfile.mkstemp(dir=path, prefix=".summary-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(summary)
+        os.replace(staging, os.path.join(path, SUMMARY_FILE))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    @staticmethod
+    def _chunk_record(doc: Document) -> dict:
+        metadata = {name: value for name, value in doc.metadata.items() if name != "doc_id"}
+        return {"text": doc.page_content, "metadata": metadata}
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries: List[Tuple[float, int, str]] = []
+            for name in os.listdir(self.cache_dir):
+                path = self._path(name)
+                if name.startswith(".") or not os.path.isdir(path):
+                    continue
+                size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+                entries.append((os.stat(path).st_mtime, size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
@@ -0,0 +1,197 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from .metrics import INFERENCE_WAIT_SECONDS
+
+
+class QueueFullError(Exception):
+    """Raised when the inference queue cannot accept more work"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("The server is busy processing other requests. Please try again shortly.")
+        self.retry_after = retry_after
+
+
+class InferenceCancelled(Exception):
+    """Raised inside model work whose caller no longer wants the result"""
+
+
+class InferenceExecutor:
+    """Runs blocking model work on a bounded thread pool, off the event loop.
+
+    Each model has its own concurrency limit so one slow model (e.g. the
+    summarizer) cannot occupy every worker. Requests beyond ``max_queue``
+    waiting tasks are rejected with ``QueueFullError``. Torch releases the GIL
+    during inference, so threads share the loaded models without copying them.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue: int,
+        model_concurrency: Optional[Dict[str, int]] = None,
+        retry_after: int = 5
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._limits = dict(model_concurrency or {})
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats: Dict[str, dict] = {}
+
+    async def run(self, model: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn`` on the pool under ``model``'s concurrency limit.
+
+        The model slot is taken on the event loop before the task is handed to
+        the pool, so pool threads only ever run work that can start right away
+        and a backlog for one model never holds threads another model needs.
+        """
+        return await self._run(model, functools.partial(fn, *args, **kwargs), admitted=False)
+
+    async def run_step(self, model: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run one step of a longer task that was already accepted, under ``model``'s limit.
+
+        Steps wait for their slot like ``run`` but are never rejected for a full
+        queue, so a busy server slows a half-done upload down instead of failing it.
+        """
+        return await self._run(model, functools.partial(fn, *args, **kwargs), admitted=True)
+
+    async def _run(self, model: str, call: Callable[[], Any], admitted: bool) -> Any:
+        with self._lock:
+            if self._queued >= self.max_queue and not admitted:
+                self._model_stats(model)["rejected"] += 1
+                raise QueueFullError(self.retry_after)
+            self._queued += 1
+
+        enqueued_at = time.perf_counter()
+        started = False
+        semaphore = self._semaphore(model)
+        try:
+            await semaphore.acquire()
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+        try:
+            waited = time.perf_counter() - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                started = True
+                stats = self._model_stats(model)
+                stats["wait_seconds_total"] += waited
+                stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+            INFERENCE_WAIT_SECONDS.labels(model).observe(waited)
+
+            loop = asyncio.get_running_loop()
+            # Carry the caller's context (request ID, profile) over to the worker thread
+            context = contextvars.copy_context()
+            future = loop.run_in_executor(self._executor, context.run, call)
+            try:
+                # Keep the slot until the work is really done, even if the caller stops waiting
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                await asyncio.wait([future])
+                raise
+        finally:
+            semaphore.release()
+            if started:
+                with self._lock:
+                    self._running -= 1
+                    self._model_stats(model)["completed"] += 1
+
+    async def stream(self, model: str, fn: Callable[..., Any], *args, **kwargs) -> AsyncIterator[Tuple[str, Any]]:
+        """Run ``fn`` on the pool and yield what it reports as it goes.
+
+        ``fn`` is called with ``emit(event, data)`` and a ``cancelled`` event as
+        keyword arguments. Emitted ``(event, data)`` pairs are yielded as they
+        arrive, followed by ``("result", return value)``. Closing the iterator
+        early, e.g. when the client disconnects, sets ``cancelled`` so ``fn``
+        can stop between steps instead of finishing work nobody will read.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def emit(event: str, data: Any):
+            if not cancelled.is_set():
+                loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+        task = asyncio.ensure_future(self.run(model, fn, *args, emit=emit, cancelled=cancelled, **kwargs))
+        # Emits are queued from the worker before it returns, so the sentinel always comes last
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+            yield "result", task.result()
+        finally:
+            if not task.done():
+                cancelled.set()
+                task.cancel()
+
+    def has_capacity(self) -> bool:
+        """Whether a new task would currently be accepted"""
+        with self._lock:
+            return self._queued < self.max_queue
+
+    def stats(self) -> dict:
+        """Queue depth and wait times, overall and per model"""
+        with self._lock:
+            models = {}
+            for name, stats in self._stats.items():
+                completed = stats["completed"]
+                models[name] = {
+                    "concurrency": self._limit(name),
+                    "completed": completed,
+                    "rejected": stats["rejected"],
+                    "wait_seconds_avg": round(stats["wait_seconds_total"] / completed, 4) if completed else 0.0,
+                    "wait_seconds_max": round(stats["wait_seconds_max"], 4),
+                }
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "models": models,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _limit(self, model: str) -> int:
+        return self._limits.get(model, self.max_workers)
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop, so keep a set of slots per loop
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._semaphores.setdefault(loop, {})
+            if model not in semaphores:
+                semaphores[model] = asyncio.Semaphore(self._limit(model))
+            return semaphores[model]
+
+    def _model_stats(self, model: str) -> dict:
+        if model not in self._stats:
+            self._stats[model] = {
+                "completed": 0,
+                "rejected": 0,
+                "wait_seconds_total": 0.0,
+                "wait_seconds_max": 0.0,
+            }
+        return self._stats[model]
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import tempfile
+from typing import Iterator, Optional, Tuple
+
+import PyPDF2
+from fastapi import UploadFile
+
+from config import (
+    PDF_EXTRACTION_MODE,
+    PDF_EXTRACTION_WORKERS,
+    PDF_PAGE_TIMEOUT,
+    PDF_PAGES_PER_TASK,
+    PDF_PARALLEL_MIN_PAGES,
+)
+from .pdf_extraction import extract_page_range, iter_pages_parallel
+
+READ_BLOCK_BYTES = 1024 * 1024
+TEXT_BLOCK_CHARS = 64 * 1024
+
+
+class DocumentTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size or page limits"""
+
+
+class SpooledUpload:
+    """An uploaded file streamed to a temporary file on disk"""
+
+    def __init__(self, path: str, filename: str, size: int, content_hash: str):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.content_hash = content_hash
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.filename.lower().endswith(".pdf")
+
+    def cleanup(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def spool_upload(file: UploadFile, max_bytes: int, spool_dir: Optional[str] = None) -> SpooledUpload:
+    """Stream an upload to disk block by block, hashing it on the way"""
+    if not file or not file.filename:
+        raise ValueError("No file provided")
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(dir=spool_dir, prefix="upload-", suffix=os.path.splitext(file.filename)[1])
+    try:
+        with os.fdopen(fd, "wb") as spooled:
+            while True:
+                block = await file.read(READ_BLOCK_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise DocumentTooLargeError(f"File exceeds the maximum upload size of {max_bytes} bytes")
+                digest.update(block)
+                spooled.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return SpooledUpload(path, file.filename, size, digest.hexdigest())
+
+
+def count_pages(upload: SpooledUpload) -> Optional[int]:
+    """Number of pages in a PDF upload, or None for text files"""
+    if not upload.is_pdf:
+        return None
+    with open(upload.path, "rb") as pdf_file:
+        return len(PyPDF2.PdfReader(pdf_file).pages)
+
+
+def iter_pages(upload: SpooledUpload, max_pages: int, mode: str = PDF_EXTRACTION_MODE) -> Iterator[Tuple[int, str]]:
+    """Yield ``(page_number, text)`` pairs without loading the whole document.
+
+    PDF pages are extracted one at a time, or by a process pool in parallel
+    depending on ``mode``. Text files are decoded incrementally and yielded in
+    blocks that end on paragraph boundaries.
+    """
+    if upload.is_pdf:
+        yield from _iter_pdf_pages(upload.path, max_pages, mode)
+    else:
+        yield from _iter_text_blocks(upload.path)
+
+
+def _iter_pdf_pages(path: str, max_pages: int, mode: str) -> Iterator[Tuple[int, str]]:
+    # Pass an open file so PyPDF2 seeks in it instead of copying it into memory
+    with open(path, "rb") as pdf_file:
+        num_pages = len(PyPDF2.PdfReader(pdf_file).pages)
+    if num_pages > max_pages:
+        raise DocumentTooLargeError(f"PDF has {num_pages} pages, the maximum is {max_pages}")
+
+    parallel = mode == "parallel" or (
+        mode == "auto" and PDF_EXTRACTION_WORKERS > 1 and num_pages >= PDF_PARALLEL_MIN_PAGES
+    )
+    if parallel:
+        yield from iter_pages_parallel(
+            path, num_pages, PDF_EXTRACTION_WORKERS, PDF_PAGES_PER_TASK, PDF_PAGE_TIMEOUT
+        )
+    elif PDF_PAGE_TIMEOUT > 0:
+        # Page deadlines need a process that can be interrupted or killed, so extract
+        # one range at a time in the pool rather than on the calling thread
+        yield from iter_pages_parallel(
+            path, num_pages, PDF_EXTRACTION_WORKERS, PDF_PAGES_PER_TASK, PDF_PAGE_TIMEOUT, max_in_flight=1
+        )
+    else:
+        for start in range(0, num_pages, PDF_PAGES_PER_TASK):
+            yield from extract_page_range(
+                path, start, min(start + PDF_PAGES_PER_TASK, num_pages), PDF_PAGE_TIMEOUT
+            )
+
+
+def _iter_text_blocks(path: str) -> Iterator[Tuple[int, str]]:
+    block_number = 0
+    remainder = ""
+    with open(path, encoding="utf-8") as text_file:
+        while True:
+            data = text_file.read(TEXT_BLOCK_CHARS)
+            if not data:
+                break
+            text = remainder + data
+            # Carry the trailing partial paragraph over to the next block
+            boundary = text.rfind("\n\n")
+            if boundary <= 0:
+                remainder = text
+                if len(remainder) < 4 * TEXT_BLOCK_CHARS:
+                    continue
+                boundary = len(remainder)
+            block_number += 1
+            yield block_number, text[:boundary]
+            remainder = text[boundary:]
+
+    if remainder.strip():
+        yield block_number + 1, remainder
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .shared_state import read_json, write_json
+
+# Fields written to the shared job file besides to_dict()
+PERSISTED_FIELDS = ("session_id", "created_at")
+
+
+class UploadJob:
+    """State of a background upload, updated by the pipeline as it runs.
+
+    Stages report progress as ``done``/``total`` counters (``total`` is None
+    when unknown). ``version`` increases on every change so watchers can tell
+    when there is something new to report. Jobs with a ``path`` are also
+    written there so other server workers can report on them.
+    """
+
+    # Progress reports are written to the shared file at most this often
+    SAVE_INTERVAL = 0.25
+
+    def __init__(self, filename: str, session_id: str):
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.session_id = session_id
+        self.status = "pending"
+        self.stage: Optional[str] = None
+        self.progress: Dict[str, dict] = {}
+        self.doc_id: Optional[str] = None
+        self.summary: Optional[str] = None
+        self.error: Optional[str] = None
+        # Seconds spent in each processing stage, filled in when the job finishes
+        self.timings: Dict[str, dict] = {}
+        self.created_at = time.time()
+        self.version = 0
+        self.path: Optional[str] = None
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> Optional["UploadJob"]:
+        """Snapshot of a job saved by another worker"""
+        data = read_json(path)
+        if data is None:
+            return None
+        job = cls(data["filename"], data["session_id"])
+        for name, value in data.items():
+            setattr(job, name, value)
+        return job
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+        self.save()
+
+    def report(self, stage: str, done: int, total: Optional[int] = None):
+        """Progress callback for the processing pipeline"""
+        with self._lock:
+            self.stage = stage
+            self.progress[stage] = {"done": done, "total": total}
+            self.version += 1
+        if time.monotonic() - self._saved_at >= self.SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+        self._saved_at = time.monotonic()
+        state = self.to_dict()
+        state.update({name: getattr(self, name) for name in PERSISTED_FIELDS})
+        write_json(self.path, state)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "filename": self.filename,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": {stage: dict(counts) for stage, counts in self.progress.items()},
+                "doc_id": self.doc_id,
+                "summary": self.summary,
+                "error": self.error,
+                "timings": {stage: dict(timing) for stage, timing in self.timings.items()},
+                "version": self.version,
+            }
+
+
+class JobManager:
+    """Keeps the most recent upload jobs in memory.
+
+    With a ``shared_dir``, jobs are also saved there as they change, so a job
+    started by one server worker can be followed through any other.
+    """
+
+    def __init__(self, max_jobs: int, shared_dir: Optional[str] = None):
+        self.max_jobs = max_jobs
+        self.directory = os.path.join(shared_dir, "jobs") if shared_dir else None
+        self._jobs: "OrderedDict[str, UploadJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, filename: str, session_id: str) -> UploadJob:
+        job = UploadJob(filename, session_id)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        if self.directory:
+            job.path = self._path(job.job_id)
+            job.save()
+            self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.directory and job_id.isalnum():
+            job = UploadJob.load(self._path(job_id))
+        return job
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _prune(self):
+        """Remove the oldest shared job files beyond max_jobs"""
+        entries = [entry for entry in os.scandir(self.directory) if not entry.name.startswith(".")]
+        if len(entries) <= self.max_jobs:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_jobs]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
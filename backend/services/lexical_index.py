@@ -0,0 +1,117 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word and number tokens"""
+    return TOKEN.findall(text.lower())
+
+
+class LexicalIndex:
+    """In-memory BM25 inverted index over chunk texts.
+
+    Chunks are numbered in the order they are added, which matches their
+    position in the FAISS index built from the same chunks, so lexical and
+    dense results can be fused by position. Scoring touches only the postings
+    of the query's terms. Removed chunks keep their position and are masked
+    out of results.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._lengths: List[int] = []
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._norms = None
+        self._removed: set = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], k1: float = 1.5, b: float = 0.75) -> "LexicalIndex":
+        index = cls(k1, b)
+        index.add(texts)
+        return index
+
+    def __len__(self) -> int:
+        """Number of live chunks"""
+        return len(self._lengths) - len(self._removed)
+
+    def add(self, texts: Iterable[str]) -> List[int]:
+        """Index more chunks, numbered after the existing ones, and return their positions"""
+        with self._lock:
+            first = len(self._lengths)
+            for text in texts:
+                position = len(self._lengths)
+                tokens = tokenize(text)
+                for term, count in Counter(tokens).items():
+                    positions, counts = self._postings.setdefault(term, ([], []))
+                    positions.append(position)
+                    counts.append(count)
+                self._lengths.append(len(tokens))
+            self._arrays.clear()
+            self._norms = None
+            return list(range(first, len(self._lengths)))
+
+    def remove(self, positions: Iterable[int]):
+        with self._lock:
+            self._removed.update(positions)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """The ``k`` best ``(position, score)`` matches for a query, best first"""
+        with self._lock:
+            terms = [term for term in set(tokenize(query)) if term in self._postings]
+            if not terms or k <= 0:
+                return []
+
+            num_chunks = len(self._lengths)
+            if self._norms is None:
+                lengths = np.asarray(self._lengths, dtype=np.float32)
+                average = max(float(lengths.mean()), 1.0)
+                self._norms = self.k1 * (1 - self.b + self.b * lengths / average)
+
+            scores = np.zeros(num_chunks, dtype=np.float32)
+            for term in terms:
+                positions, counts = self._term_arrays(term)
+                idf = math.log(1 + (num_chunks - len(positions) + 0.5) / (len(positions) + 0.5))
+                scores[positions] += idf * counts * (self.k1 + 1) / (counts + self._norms[positions])
+            if self._removed:
+                scores[list(self._removed)] = 0
+
+        k = min(k, num_chunks)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+    def _term_arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        if term not in self._arrays:
+            positions, counts = self._postings[term]
+            self._arrays[term] = (np.asarray(positions, dtype=np.int64), np.asarray(counts, dtype=np.float32))
+        return self._arrays[term]
+
+
+def is_confident(hits: Sequence[Tuple[int, float]], ratio: float, min_hits: int = 2) -> bool:
+    """Whether the best lexical hit clearly beats the runner-up, with at least ``min_hits`` hits to return.
+
+    A lone hit has nothing to be compared with, and fewer hits than the caller
+    needs would leave it short of context, so neither counts as confident.
+    """
+    if ratio <= 0 or len(hits) < max(2, min_hits):
+        return False
+    return hits[0][1] >= ratio * hits[1][1]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], weights: Sequence[float], k: int = 60) -> List[int]:
+    """Merge ranked lists: each item scores ``sum(weight / (k + rank))`` over the lists it appears in"""
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
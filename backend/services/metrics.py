@@ -0,0 +1,340 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional, TypeVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    ProcessCollector,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+from starlette.datastructures import Headers, MutableHeaders
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+# One line per HTTP request
+request_logger = logging.getLogger("requests")
+
+# Set by server.py before anything imports prometheus_client: every worker writes its metrics
+# to files in this directory and /metrics adds them up
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Metrics live in their own registry so /metrics only shows this application and the process
+REGISTRY = CollectorRegistry()
+PROCESS_COLLECTOR = ProcessCollector(registry=REGISTRY)
+# Collectors computing their values at scrape time, which multiprocess mode cannot add up itself
+_scrape_time_collectors = [PROCESS_COLLECTOR]
+_publisher: Optional["StatsPublisher"] = None
+
+STAGE_SECONDS = Histogram(
+    "docai_stage_seconds",
+    "Time spent in each processing stage",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    registry=REGISTRY
+)
+INFERENCE_WAIT_SECONDS = Histogram(
+    "docai_inference_wait_seconds",
+    "Time model work waited for a worker and its model's concurrency slot",
+    ["model"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+    registry=REGISTRY
+)
+REQUEST_SECONDS = Histogram(
+    "docai_request_seconds",
+    "HTTP request latency, until the response headers are sent",
+    ["method", "route", "status"],
+    registry=REGISTRY
+)
+
+_profile: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("profile", default=None)
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+
+class Profile:
+    """Stage timings collected for one request or upload job"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._stages: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            totals = self._stages.setdefault(stage, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+
+    def stages(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                stage: {"seconds": round(seconds, 6), "count": count}
+                for stage, (seconds, count) in self._stages.items()
+            }
+
+    def server_timing(self) -> str:
+        """The stages as a ``Server-Timing`` header value, in milliseconds"""
+        entries = [
+            f"{stage};dur={timing['seconds'] * 1000:.1f}" for stage, timing in self.stages().items()
+        ]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def start_profile() -> Profile:
+    """Collect stage timings for the rest of the current context"""
+    profile = Profile()
+    _profile.set(profile)
+    return profile
+
+
+def current_profile() -> Optional[Profile]:
+    return _profile.get()
+
+
+def set_request_id(request_id: Optional[str]):
+    _request_id.set(request_id)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def record_stage(name: str, seconds: float):
+    """Add time spent in a stage to the histogram and the current profile, if any"""
+    STAGE_SECONDS.labels(name).observe(seconds)
+    profile = _profile.get()
+    if profile is not None:
+        profile.add(name, seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block (or, as a decorator, a function) as a processing stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def timed_iter(name: str, items: Iterable[T]) -> Iterator[T]:
+    """Yield from ``items``, timing only the work of producing each item"""
+    iterator = iter(items)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        record_stage(name, time.perf_counter() - started)
+        yield item
+
+
+class StatsCollector:
+    """Exports the services' own ``stats()`` as gauges and counters at scrape time"""
+
+    def __init__(
+        self,
+        model_stats: Callable[[], dict],
+        inference_stats: Callable[[], dict],
+        cache_stats: Callable[[], Dict[str, dict]],
+        document_stats: Callable[[], dict]
+    ):
+        self.model_stats = model_stats
+        self.inference_stats = inference_stats
+        self.cache_stats = cache_stats
+        self.document_stats = document_stats
+
+    def collect(self):
+        loaded = GaugeMetricFamily("docai_model_loaded", "Whether a model is loaded", labels=["model", "backend"])
+        load_seconds = GaugeMetricFamily("docai_model_load_seconds", "Time taken to load a model", labels=["model"])
+        model_rss = GaugeMetricFamily(
+            "docai_model_rss_bytes", "Resident memory growth while loading a model", labels=["model"]
+        )
+        parameters = GaugeMetricFamily(
+            "docai_model_parameter_bytes", "Size of a model's weights", labels=["model"]
+        )
+        for name, stats in self.model_stats().items():
+            loaded.add_metric([name, stats.get("backend") or ""], 1 if stats["loaded"] else 0)
+            if "load_seconds" in stats:
+                load_seconds.add_metric([name], stats["load_seconds"])
+                model_rss.add_metric([name], stats["rss_bytes"])
+            if stats.get("parameter_bytes") is not None:
+                parameters.add_metric([name], stats["parameter_bytes"])
+        yield from (loaded, load_seconds, model_rss, parameters)
+
+        inference = self.inference_stats()
+        yield GaugeMetricFamily(
+            "docai_inference_queue_depth", "Model tasks waiting for a worker", value=inference["queue_depth"]
+        )
+        yield GaugeMetricFamily("docai_inference_running", "Model tasks running", value=inference["running"])
+        completed = CounterMetricFamily("docai_inference_completed", "Model tasks finished", labels=["model"])
+        rejected = CounterMetricFamily(
+            "docai_inference_rejected", "Model tasks rejected because the queue was full", labels=["model"]
+        )
+        for name, stats in inference["models"].items():
+            completed.add_metric([name], stats["completed"])
+            rejected.add_metric([name], stats["rejected"])
+        yield from (completed, rejected)
+
+        hits = CounterMetricFamily("docai_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("docai_cache_misses", "Cache misses", labels=["cache"])
+        entries = GaugeMetricFamily("docai_cache_entries", "Entries held by a cache", labels=["cache"])
+        for name, stats in self.cache_stats().items():
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            entries.add_metric([name], stats["size"])
+        yield from (hits, misses, entries)
+
+        documents = self.document_stats()
+        yield GaugeMetricFamily("docai_documents", "Documents held in memory", value=documents["documents"])
+        yield GaugeMetricFamily("docai_sessions", "Sessions with documents", value=documents["sessions"])
+        yield GaugeMetricFamily(
+            "docai_document_text_chars", "Characters of document text held in memory", value=documents["text_chars"]
+        )
+        vectors = GaugeMetricFamily("docai_index_vectors", "Vectors held by the indexes", labels=["scope"])
+        index_bytes = GaugeMetricFamily(
+            "docai_index_bytes", "Approximate memory held by the stored vectors in this process", labels=["scope"]
+        )
+        for scope in ("document", "session"):
+            vectors.add_metric([scope], documents[f"{scope}_vectors"])
+            index_bytes.add_metric([scope], documents[f"{scope}_index_bytes"])
+        yield from (vectors, index_bytes)
+
+
+class RequestMetricsMiddleware:
+    """Times, logs and optionally profiles every HTTP request.
+
+    Requests sending ``profile_header`` get a ``Server-Timing`` response header
+    with the time spent in each stage. Streaming responses report the stages
+    finished before their headers were sent.
+    """
+
+    def __init__(self, app, profile_header: str = "X-Profile"):
+        self.app = app
+        self.profile_header = profile_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        set_request_id(headers.get("x-request-id") or uuid.uuid4().hex)
+        profile = start_profile() if headers.get(self.profile_header) else None
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                # Label by route template rather than path so IDs do not create new series
+                route = getattr(scope.get("route"), "path", "unmatched")
+                REQUEST_SECONDS.labels(scope["method"], route, str(message["status"])).observe(elapsed)
+                response_headers = MutableHeaders(scope=message)
+                response_headers.append("X-Request-Id", current_request_id())
+                if profile is not None:
+                    response_headers.append("Server-Timing", profile.server_timing())
+                request_logger.info(
+                    "%s %s %s", scope["method"], scope["path"], message["status"],
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": message["status"],
+                        "duration_ms": round(elapsed * 1000, 1),
+                        **({"stages": profile.stages()} if profile is not None else {}),
+                    }
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+
+class StatsPublisher:
+    """Copies scrape-time collectors into multiprocess metrics, so /metrics covers every worker.
+
+    Multiprocess mode only aggregates Counter, Gauge and Histogram objects,
+    which each worker writes to PROMETHEUS_MULTIPROC_DIR. Every ``interval``
+    seconds the collectors' gauges are copied per worker (with a ``pid``
+    label) and their counters are increased by how much they grew since the
+    last copy, so counters stay monotonic across workers and restarts.
+    """
+
+    def __init__(self, collectors: list, interval: float):
+        self.collectors = collectors
+        self.interval = interval
+        self._metrics: Dict[str, object] = {}
+        self._last: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._run, name="metrics-publisher", daemon=True).start()
+
+    def publish(self):
+        with self._lock:
+            for collector in self.collectors:
+                for family in collector.collect():
+                    for sample in family.samples:
+                        if family.type == "gauge":
+                            self._child(Gauge, family, sample.labels).set(sample.value)
+                        elif family.type == "counter" and sample.name.endswith("_total"):
+                            key = (sample.name, tuple(sorted(sample.labels.items())))
+                            last = self._last.get(key, 0.0)
+                            # A counter that went down was reset (e.g. a cleared cache); count it from zero
+                            increase = sample.value - last if sample.value >= last else sample.value
+                            if increase > 0:
+                                self._child(Counter, family, sample.labels).inc(increase)
+                            self._last[key] = sample.value
+
+    def _child(self, metric_type, family, labels: Dict[str, str]):
+        metric = self._metrics.get(family.name)
+        if metric is None:
+            options = {"multiprocess_mode": "liveall"} if metric_type is Gauge else {}
+            # Not registered anywhere: in multiprocess mode values go to files, not to a registry
+            metric = metric_type(family.name, family.documentation, list(labels), registry=None, **options)
+            self._metrics[family.name] = metric
+        return metric.labels(**labels) if labels else metric
+
+    def _run(self):
+        while True:
+            try:
+                self.publish()
+            except Exception as e:
+                logger.exception("Error publishing metrics: %s", e)
+            time.sleep(self.interval)
+
+
+def register_collector(collector: StatsCollector):
+    REGISTRY.register(collector)
+    _scrape_time_collectors.append(collector)
+
+
+def start_stats_publisher(interval: float):
+    """In multiprocess mode, start copying this worker's scrape-time stats; call it once per worker"""
+    global _publisher
+    if MULTIPROCESS and _publisher is None:
+        _publisher = StatsPublisher(_scrape_time_collectors, interval)
+        _publisher.start()
+
+
+def render_metrics() -> bytes:
+    """Everything in the registry (or, across workers, the multiprocess directory) in the Prometheus text format"""
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY)
+    if _publisher is not None:
+        # The answering worker's own numbers can be current; the others are at most an interval old
+        _publisher.publish()
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return generate_latest(registry)
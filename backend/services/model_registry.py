@@ -0,0 +1,152 @@
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from config import EMBEDDING_MODEL, QA_MODEL, SUMMARIZER_MODEL
+from .backends import backend_for, load_embeddings, load_qa_model, load_summarizer
+
+logger = logging.getLogger(__name__)
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process in bytes (kilobytes on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _current_rss() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak RSS is the best we can do without procfs
+        return _peak_rss()
+
+
+def _parameter_bytes(model: Any) -> Optional[int]:
+    """Size of a model's weights, if it wraps a torch module"""
+    import torch
+
+    def tensor_bytes(value: Any) -> int:
+        # Quantized layers keep their packed weights in tuples rather than parameters
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(tensor_bytes(item) for item in value)
+        return 0
+
+    for candidate in (model, getattr(model, "model", None), getattr(model, "client", None)):
+        if isinstance(candidate, torch.nn.Module):
+            return sum(tensor_bytes(value) for value in candidate.state_dict().values())
+    return None
+
+
+class ModelRegistry:
+    """Process-wide registry that loads each model once, on first use.
+
+    Services ask for models by name and all of them share the same instance.
+    Load time and resident memory growth are recorded per model.
+    """
+    _instance = None
+    _lock = threading.Lock()
+    _loaders: Dict[str, Callable[[], Any]] = {}
+    _models: Dict[str, Any] = {}
+    _model_locks: Dict[str, threading.Lock] = {}
+    _stats: Dict[str, dict] = {}
+    _info: Dict[str, dict] = {}
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ModelRegistry, cls).__new__(cls)
+        return cls._instance
+
+    @classmethod
+    def register(cls, name: str, loader: Callable[[], Any], **info):
+        """Register (or replace) the loader for a model name; ``info`` is reported in ``stats``"""
+        with cls._lock:
+            cls._loaders[name] = loader
+            cls._info[name] = info
+            cls._models.pop(name, None)
+            cls._stats.pop(name, None)
+            cls._model_locks.setdefault(name, threading.Lock())
+
+    @classmethod
+    def get(cls, name: str) -> Any:
+        """Return the shared instance of a model, loading it if needed"""
+        model = cls._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in cls._loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        with cls._model_locks[name]:
+            model = cls._models.get(name)
+            if model is None:
+                model = cls._load(name)
+        return model
+
+    @classmethod
+    def is_loaded(cls, name: str) -> bool:
+        return name in cls._models
+
+    @classmethod
+    def warm_up(cls, names: Optional[Iterable[str]] = None):
+        """Load the given models (or all registered ones) ahead of the first request"""
+        names = list(names) if names else []
+        if not names or "all" in names:
+            names = list(cls._loaders)
+        for name in names:
+            cls.get(name)
+
+    @classmethod
+    def stats(cls) -> Dict[str, dict]:
+        """Load time and memory usage for every registered model"""
+        return {
+            name: {"loaded": name in cls._models, **cls._info.get(name, {}), **cls._stats.get(name, {})}
+            for name in cls._loaders
+        }
+
+    @classmethod
+    def _load(cls, name: str) -> Any:
+        rss_before = _current_rss()
+        started = time.perf_counter()
+        try:
+            model = cls._loaders[name]()
+        except Exception as e:
+            logger.exception("Error loading model %s: %s", name, e)
+            raise
+        load_seconds = time.perf_counter() - started
+
+        cls._stats[name] = {
+            "load_seconds": round(load_seconds, 3),
+            "rss_bytes": max(0, _current_rss() - rss_before),
+            "parameter_bytes": _parameter_bytes(model),
+        }
+        cls._models[name] = model
+        return model
+
+
+def _load_qa_tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(QA_MODEL)
+
+
+ModelRegistry.register(
+    "qa_model", lambda: load_qa_model(QA_MODEL, backend_for("qa_model")), backend=backend_for("qa_model")
+)
+ModelRegistry.register("qa_tokenizer", _load_qa_tokenizer)
+# Fast tokenizers switch truncation and padding settings on every call and are not thread-safe,
+# so chunking (no truncation) gets its own copy instead of sharing the QA service's
+ModelRegistry.register("chunk_tokenizer", _load_qa_tokenizer)
+ModelRegistry.register(
+    "summarizer", lambda: load_summarizer(SUMMARIZER_MODEL, backend_for("summarizer")), backend=backend_for("summarizer")
+)
+ModelRegistry.register(
+    "embeddings", lambda: load_embeddings(EMBEDDING_MODEL, backend_for("embeddings")), backend=backend_for("embeddings")
+)
@@ -0,0 +1,151 @@
+import logging
+import multiprocessing
+import signal
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Deque, Iterator, List, Optional, Tuple
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class PageTimeoutError(Exception):
+    """Raised when extracting a single page takes longer than allowed"""
+
+
+def get_extraction_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Shared process pool for PDF extraction, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawn clean workers rather than forking a process that holds models and threads
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def shutdown_extraction_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def restart_extraction_pool(executor: ProcessPoolExecutor):
+    """Kill a pool whose worker is stuck; the next get_extraction_pool call starts a new one.
+
+    A running task cannot be cancelled, so the only way to get its process
+    back is to terminate it. Work still queued on the pool fails with
+    BrokenProcessPool and has to be resubmitted.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    # ProcessPoolExecutor has no public way to stop its workers
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+@contextmanager
+def _page_deadline(seconds: float):
+    """Interrupt the enclosed block after ``seconds`` using SIGALRM.
+
+    Signals can only be handled on the main thread, which is where process
+    pool workers run their tasks. Elsewhere this is a no-op.
+    """
+    if seconds <= 0 or not hasattr(signal, "SIGALRM") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_timeout(signum, frame):
+        raise PageTimeoutError()
+
+    previous = signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def extract_page_range(path: str, start: int, end: int, page_timeout: float) -> List[Tuple[int, str]]:
+    """Extract pages ``[start, end)`` (zero-based) as ``(page_number, text)`` pairs"""
+    pages = []
+    with open(path, "rb") as pdf_file:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        for index in range(start, end):
+            try:
+                with _page_deadline(page_timeout):
+                    text = pdf_reader.pages[index].extract_text() or ""
+            except PageTimeoutError:
+                logger.warning("Timed out extracting page %d after %ss, skipping it", index + 1, page_timeout)
+                text = ""
+            pages.append((index + 1, text))
+    return pages
+
+
+def iter_pages_parallel(
+    path: str,
+    num_pages: int,
+    workers: int,
+    pages_per_task: int,
+    page_timeout: float,
+    max_in_flight: Optional[int] = None
+) -> Iterator[Tuple[int, str]]:
+    """Extract page ranges across a process pool and yield pages in order.
+
+    Only a few ranges per worker (or ``max_in_flight``) are in flight at once,
+    so pages are handed on as they are extracted rather than all being held in
+    memory. A range that outlives its deadline is skipped and the pool is
+    restarted to free the stuck process.
+    """
+    pages_per_task = max(1, pages_per_task)
+    ranges = [(start, min(start + pages_per_task, num_pages)) for start in range(0, num_pages, pages_per_task)]
+    max_in_flight = max_in_flight or 2 * max(1, workers)
+
+    def submit(start: int, end: int) -> Tuple[ProcessPoolExecutor, Future]:
+        executor = get_extraction_pool(workers)
+        return executor, executor.submit(extract_page_range, path, start, end, page_timeout)
+
+    in_flight: Deque[Tuple[Tuple[int, int], ProcessPoolExecutor, Future]] = deque()
+    retried = set()
+    next_range = 0
+    try:
+        while next_range < len(ranges) or in_flight:
+            while next_range < len(ranges) and len(in_flight) < max_in_flight:
+                start, end = ranges[next_range]
+                in_flight.append(((start, end), *submit(start, end)))
+                next_range += 1
+
+            (start, end), executor, future = in_flight.popleft()
+            try:
+                # Backstop in case a worker is stuck somewhere SIGALRM cannot interrupt
+                yield from future.result(timeout=page_timeout * (end - start) + 30)
+            except TimeoutError:
+                logger.warning("Timed out extracting pages %d-%d, skipping them", start + 1, end)
+                restart_extraction_pool(executor)
+                yield from ((index + 1, "") for index in range(start, end))
+            except BrokenProcessPool:
+                # The pool was restarted (here or by another upload) or a worker crashed; retry once
+                if (start, end) in retried:
+                    logger.warning("Extracting pages %d-%d failed twice, skipping them", start + 1, end)
+                    yield from ((index + 1, "") for index in range(start, end))
+                else:
+                    retried.add((start, end))
+                    in_flight.appendleft(((start, end), *submit(start, end)))
+    finally:
+        for _, _, future in in_flight:
+            future.cancel()
@@ -1,147 +1,526 @@
-from transformers import AutoModelForQuestionAnswering, AutoTokenizer
-from typing import List
-from models.document import Answer, QuestionResponse
+import logging
+import re
+import threading
+import torch
+from langchain_core.documents import Document
+from transformers import PreTrainedModel, PreTrainedTokenizerBase
+from typing import Any, Callable, List, Optional, Tuple
+from config import (
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+    DEFAULT_SESSION_ID,
+    MAX_BATCH_QUESTIONS,
+    QA_BATCH_SIZE,
+    QA_DOC_STRIDE,
+    QA_MAX_ANSWER_TOKENS,
+    QA_MAX_SEQ_LENGTH,
+    RETRIEVAL_K,
+)
+from models.document import Answer, QuestionRequest, QuestionResponse
 from services.document_processor import DocumentProcessor
-from .state import DocumentState
+from .cache import LRUCache
+from .inference import InferenceCancelled
+from .metrics import stage
+from .model_registry import ModelRegistry
+from .span_decoder import decode_best_spans
+from .state import DocumentEntry, DocumentState
+
+logger = logging.getLogger(__name__)
+
+
+class PendingAnswers:
+    """Questions on their way from the answer cache through retrieval to the QA model.
+
+    ``answers`` holds cached answers and None for the ``missing`` questions,
+    whose retrieved chunks are in ``retrieved`` in the same order. Cache keys
+    are None until the scope of the questions is known.
+    """
+
+    def __init__(
+        self,
+        questions: List[str],
+        doc_id: Optional[str],
+        session_id: str,
+        cache_keys: List[Optional[tuple]],
+        answers: List[Optional[Answer]]
+    ):
+        self.questions = questions
+        self.doc_id = doc_id
+        self.session_id = session_id
+        self.cache_keys = cache_keys
+        self.answers = answers
+        self.missing = [i for i, answer in enumerate(answers) if answer is None]
+        self.retrieved: List[List[Document]] = []
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
 
 class QAService:
-    def __init__(self):
+    def __init__(self, document_processor: Optional[DocumentProcessor] = None):
+        self.document_processor = document_processor or DocumentProcessor()
+        self.state = DocumentState()
+        # Keyed by (document content hash, normalized question)
+        self.answer_cache = LRUCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL)
+
+    @property
+    def model(self) -> PreTrainedModel:
+        return ModelRegistry.get("qa_model")
+
+    @property
+    def tokenizer(self) -> PreTrainedTokenizerBase:
+        return ModelRegistry.get("qa_tokenizer")
+
+    def get_answer(
+        self,
+        question: str,
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> Answer:
+        """Get answer for a question using one document, or all of the session's documents"""
+        return self.get_answers([question], doc_id, session_id)[0]
+
+    def get_answers(
+        self,
+        questions: List[str],
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> List[Answer]:
+        """Answer several questions with a single batched forward pass.
+
+        Every retrieved chunk of every question is split into overlapping
+        windows, all windows are scored together, and each question gets the
+        best valid span found in any of its windows.
+        """
+        return self.finish_answers(self.retrieve_answers(questions, doc_id, session_id))
+
+    def retrieve_answers(
+        self,
+        questions: List[str],
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> PendingAnswers:
+        """First half of ``get_answers``: cached answers, and retrieved context for the rest"""
+        return self.retrieve_pending(self.lookup_answers(questions, doc_id, session_id))
+
+    def lookup_answers(
+        self,
+        questions: List[str],
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> PendingAnswers:
+        """Answer what the cache can, using only documents this worker already has open.
+
+        This never loads an index or runs a model, so it can run on the event
+        loop before any model slot is taken.
+        """
+        if not questions or any(not question.strip() for question in questions):
+            raise ValueError("Question cannot be empty")
+
+        scope, entries = self._open_scope(doc_id, session_id)
+        if scope is None:
+            return PendingAnswers(questions, doc_id, session_id, [None] * len(questions), [None] * len(questions))
+        cache_keys = [(scope, self._normalize_question(question)) for question in questions]
+        return PendingAnswers(
+            questions,
+            doc_id,
+            session_id,
+            cache_keys,
+            [self._cached_answer(key, session_id, entries) for key in cache_keys]
+        )
+
+    def retrieve_pending(self, pending: PendingAnswers) -> PendingAnswers:
+        """Retrieve context for the questions the cache could not answer.
+
+        This only needs the embedding model, so callers can run it under that
+        model's concurrency limit and ``finish_answers`` under the QA model's.
+        """
+        if pending.complete:
+            return pending
+
+        # Make sure the document (or session) has an index
+        self.document_processor.get_vector_store(pending.doc_id, pending.session_id)
+
+        # Questions the cache could not be asked about yet, for want of an open document
+        unscoped = [i for i in pending.missing if pending.cache_keys[i] is None]
+        if unscoped:
+            scope = self._answer_scope(pending.doc_id, pending.session_id)
+            for i in unscoped:
+                pending.cache_keys[i] = (scope, self._normalize_question(pending.questions[i]))
+                pending.answers[i] = self._cached_answer(pending.cache_keys[i], pending.session_id)
+            pending.missing = [i for i in pending.missing if pending.answers[i] is None]
+        if pending.missing:
+            pending.retrieved = self._retrieve(
+                [pending.questions[i] for i in pending.missing], pending.doc_id, pending.session_id
+            )
+        return pending
+
+    def finish_answers(self, pending: PendingAnswers, cancelled: Optional[threading.Event] = None) -> List[Answer]:
+        """Second half of ``get_answers``: run the QA model over the retrieved context"""
+        if pending.complete:
+            return pending.answers
         try:
-            model_name = "deepset/roberta-base-squad2"
-            self.model = AutoModelForQuestionAnswering.from_pretrained(model_name)
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.document_processor = DocumentProcessor()
-            self.state = DocumentState()
+            answers = self._answer_retrieved([pending.questions[i] for i in pending.missing], pending.retrieved, cancelled)
+            for i, answer in zip(pending.missing, answers):
+                self._cache_answer(pending.cache_keys[i], answer, pending.session_id)
+                pending.answers[i] = answer
+            pending.missing = []
+            return pending.answers
+        except InferenceCancelled:
+            raise
         except Exception as e:
-            print(f"Error initializing QA model: {str(e)}")
+            logger.exception("Error in get_answer: %s", e)
             raise
 
-    def get_answer(self, question: str) -> Answer:
-        """Get answer for a question using the document context"""
-        if not question.strip():
-            raise ValueError("Question cannot be empty")
+    def stream_answer(
+        self,
+        pending: PendingAnswers,
+        emit: Optional[Callable[[str, Any], None]] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> Answer:
+        """Finish a single retrieved question, emitting its context before the QA model runs.
 
-        # Get the current document state
-        vector_store = self.state.get_vector_store()
-        if not vector_store:
-            raise ValueError("No document has been uploaded yet. Please upload a document first.")
+        ``emit("context", chunks)`` reports the retrieved chunks. Setting
+        ``cancelled`` stops the QA model between micro-batches.
+        """
+        if emit and not pending.complete:
+            emit("context", [
+                {"text": doc.page_content, **{k: doc.metadata.get(k) for k in ("doc_id", "page", "start", "end")}}
+                for doc in pending.retrieved[0]
+            ])
+        return self.finish_answers(pending, cancelled)[0]
 
-        try:
-            context = self.document_processor.get_relevant_context(question)
-            if not context.strip():
+    def _retrieve(self, questions: List[str], doc_id: Optional[str], session_id: str) -> List[List[Document]]:
+        retrieved = []
+        for docs in self.document_processor.get_relevant_documents_batch(
+            questions, k=RETRIEVAL_K, doc_id=doc_id, session_id=session_id
+        ):
+            docs = [doc for doc in docs if doc.page_content.strip()]
+            if not docs:
                 raise ValueError("Could not find relevant context for the question")
+            retrieved.append(docs)
+        return retrieved
+
+    def _answer_retrieved(
+        self,
+        questions: List[str],
+        retrieved: List[List[Document]],
+        cancelled: Optional[threading.Event] = None
+    ) -> List[Answer]:
+        # One (question, chunk) pair per retrieved chunk
+        pairs = [(q_idx, doc) for q_idx, docs in enumerate(retrieved) for doc in docs]
+        spans = self._find_best_spans(
+            [questions[q_idx] for q_idx, _ in pairs],
+            [doc.page_content for _, doc in pairs],
+            cancelled
+        )
+
+        best = {}
+        for (q_idx, doc), (answer_text, score, offset) in zip(pairs, spans):
+            if q_idx not in best or score > best[q_idx][1]:
+                best[q_idx] = (answer_text, score, offset, doc)
+
+        answers = []
+        for q_idx, docs in enumerate(retrieved):
+            answer_text, score, offset, doc = best[q_idx]
+            # Chunks know where they sit in the document, so the answer can too
+            chunk_start = doc.metadata.get("start")
+            start = chunk_start + offset if chunk_start is not None and offset is not None else None
+            answers.append(Answer(
+                answer=answer_text,
+                context=" ".join(d.page_content for d in docs),
+                score=score if score != float("-inf") else None,
+                page=doc.metadata.get("page"),
+                doc_id=doc.metadata.get("doc_id"),
+                start=start,
+                end=start + len(answer_text) if start is not None else None
+            ))
+        return answers
+
+    def answer_batch(
+        self,
+        requests: List[QuestionRequest],
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> List[QuestionResponse]:
+        """Answer questions about any number of documents, in request order.
+
+        Questions are grouped by document so each group shares one retrieval
+        search and one set of batched QA model passes.
+        """
+        return self.finish_batch(requests, self.retrieve_batch(self.lookup_batch(requests, session_id)))
+
+    def lookup_batch(
+        self,
+        requests: List[QuestionRequest],
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> List[Tuple[List[int], PendingAnswers]]:
+        """Cache half of ``answer_batch``: request indices and pending answers per document"""
+        if not requests:
+            raise ValueError("No questions were given")
+        if len(requests) > MAX_BATCH_QUESTIONS:
+            raise ValueError(f"At most {MAX_BATCH_QUESTIONS} questions can be asked at once")
+
+        groups = {}
+        for i, request in enumerate(requests):
+            groups.setdefault(request.doc_id, []).append(i)
+        return [
+            (indices, self.lookup_answers([requests[i].question for i in indices], doc_id, session_id))
+            for doc_id, indices in groups.items()
+        ]
+
+    def retrieve_batch(
+        self,
+        groups: List[Tuple[List[int], PendingAnswers]]
+    ) -> List[Tuple[List[int], PendingAnswers]]:
+        """Retrieval half of ``answer_batch``"""
+        return [(indices, self.retrieve_pending(pending)) for indices, pending in groups]
+
+    def finish_batch(
+        self,
+        requests: List[QuestionRequest],
+        groups: List[Tuple[List[int], PendingAnswers]]
+    ) -> List[QuestionResponse]:
+        """QA model half of ``answer_batch``"""
+        responses: List[Optional[QuestionResponse]] = [None] * len(requests)
+        for indices, pending in groups:
+            for i, answer in zip(indices, self.finish_answers(pending)):
+                responses[i] = QuestionResponse(
+                    question=requests[i].question,
+                    answer=answer.answer,
+                    context=answer.context,
+                    doc_id=answer.doc_id or requests[i].doc_id,
+                    score=answer.score,
+                    page=answer.page,
+                    start=answer.start,
+                    end=answer.end
+                )
+        return responses
+
+    def _open_scope(self, doc_id: Optional[str], session_id: str) -> Tuple[Optional[str], List[DocumentEntry]]:
+        """``_answer_scope`` and its documents from what is already open here; no scope if that is not enough"""
+        if doc_id:
+            document = self.state.get_open_document(doc_id, session_id)
+            return (document.content_hash, [document]) if document else (None, [])
+        entries = self.state.list_open_documents(session_id)
+        if entries is None:
+            return None, []
+        return "session:" + ",".join(sorted(entry.content_hash for entry in entries)), entries
+
+    def _answer_scope(self, doc_id: Optional[str], session_id: str) -> str:
+        """Identify the text an answer was drawn from, independent of upload IDs"""
+        if doc_id:
+            document = self.state.get_document(doc_id, session_id)
+            return document.content_hash if document else doc_id
+        hashes = sorted(entry.content_hash for entry in self.state.list_documents(session_id))
+        return "session:" + ",".join(hashes)
 
-            # Tokenize input
-            tokenizer_outputs = self.tokenizer(
-                question,
-                context,
+    def _cached_answer(
+        self,
+        key: tuple,
+        session_id: str,
+        entries: Optional[List[DocumentEntry]] = None
+    ) -> Optional[Answer]:
+        """Look up an answer, pointing it at this session's copy (among ``entries``) of the source document"""
+        cached = self.answer_cache.get(key)
+        if cached is None:
+            return None
+        answer, content_hash = cached
+        for entry in entries if entries is not None else self.state.list_documents(session_id):
+            if entry.content_hash == content_hash:
+                return answer.copy(update={"doc_id": entry.doc_id})
+        return None
+
+    def _cache_answer(self, key: tuple, answer: Answer, session_id: str):
+        # Document IDs differ per upload, so remember the source by content instead
+        source = self.state.get_document(answer.doc_id, session_id) if answer.doc_id else None
+        if source is not None:
+            self.answer_cache.put(key, (answer.copy(update={"doc_id": None}), source.content_hash))
+
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        return re.sub(r"\s+", " ", question.strip().lower()).rstrip("?.! ")
+
+    def _find_best_spans(
+        self,
+        questions: List[str],
+        contexts: List[str],
+        cancelled: Optional[threading.Event] = None
+    ) -> List[Tuple[str, float, Optional[int]]]:
+        """Return the best answer span, its score and its offset in the context for each pair.
+
+        Windows are sorted by length and run through the model in micro-batches
+        of ``QA_BATCH_SIZE``, each padded only to its own longest window.
+        """
+        with stage("tokenize"):
+            encoded = self.tokenizer(
+                questions,
+                contexts,
                 return_tensors="pt",
-                max_length=384,
-                truncation=True,
-                stride=128,
+                max_length=QA_MAX_SEQ_LENGTH,
+                truncation="only_second",
+                stride=QA_DOC_STRIDE,
                 return_overflowing_tokens=True,
                 return_offsets_mapping=True,
                 padding=True
             )
-            
-            # Separate model inputs from post-processing data
-            model_inputs = {
-                'input_ids': tokenizer_outputs['input_ids'],
-                'attention_mask': tokenizer_outputs['attention_mask']
-            }
+        window_pairs = encoded["overflow_to_sample_mapping"].tolist()
+        context_mask = torch.tensor([
+            [sequence_id == 1 for sequence_id in encoded.sequence_ids(window)]
+            for window in range(len(window_pairs))
+        ])
 
-            # Get model outputs
-            outputs = self.model(**model_inputs)
-            start_logits = outputs.start_logits[0]
-            end_logits = outputs.end_logits[0]
-            
-            # Get the most likely answer span
-            start_idx = start_logits.argmax()
-            end_idx = end_logits.argmax()
-            
-            # Convert token indices to character indices
-            offset_mapping = tokenizer_outputs.offset_mapping[0]
-            start_char = offset_mapping[start_idx][0]
-            end_char = offset_mapping[end_idx][1]
-            
-            # Extract answer text
-            answer_text = context[start_char:end_char]
-                
-            return Answer(
-                answer=str(answer_text),
-                context=context
+        num_windows = len(window_pairs)
+        starts = torch.zeros(num_windows, dtype=torch.long)
+        ends = torch.zeros(num_windows, dtype=torch.long)
+        scores = torch.full((num_windows,), float("-inf"))
+
+        lengths = encoded["attention_mask"].sum(dim=1)
+        order = torch.argsort(lengths)
+        trim_padding = self.tokenizer.padding_side == "right"
+        batch_size = max(1, QA_BATCH_SIZE)
+        for begin in range(0, num_windows, batch_size):
+            if cancelled is not None and cancelled.is_set():
+                raise InferenceCancelled()
+            batch = order[begin:begin + batch_size]
+            # With right padding everything past the longest window in the batch is padding
+            width = int(lengths[batch].max()) if trim_padding else encoded["input_ids"].shape[1]
+            with stage("qa_forward"), torch.no_grad():
+                outputs = self.model(
+                    input_ids=encoded["input_ids"][batch, :width],
+                    attention_mask=encoded["attention_mask"][batch, :width]
+                )
+            starts[batch], ends[batch], scores[batch] = decode_best_spans(
+                outputs.start_logits, outputs.end_logits, context_mask[batch, :width], QA_MAX_ANSWER_TOKENS
             )
-        except Exception as e:
-            print(f"Error in get_answer: {str(e)}")
-            raise
 
-    def generate_questions(self, num_questions: int = 3) -> List[QuestionResponse]:
+        spans = [("", float("-inf"), None)] * len(contexts)
+        offsets = encoded["offset_mapping"]
+        for window, pair in enumerate(window_pairs):
+            score = scores[window].item()
+            if score <= spans[pair][1]:
+                continue
+            start_char = offsets[window][starts[window]][0].item()
+            end_char = offsets[window][ends[window]][1].item()
+            spans[pair] = (contexts[pair][start_char:end_char], score, start_char)
+        return spans
+
+    def generate_questions(
+        self,
+        num_questions: int = 3,
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> List[QuestionResponse]:
         """Generate challenge questions based on the document content"""
+        contexts, pending = self.retrieve_challenge(num_questions, doc_id, session_id)
+        return self.finish_challenge(contexts, pending)
+
+    def retrieve_challenge(
+        self,
+        num_questions: int = 3,
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> Tuple[List[str], PendingAnswers]:
+        """Embedding half of ``generate_questions``: passages, a question about each and their context"""
         # Check if document is uploaded
-        vector_store = self.state.get_vector_store()
-        if not vector_store:
-            raise ValueError("No document has been uploaded yet. Please upload a document first.")
+        document = self._get_document(doc_id, session_id)
 
         try:
-            questions = []
-            contexts = self._get_diverse_contexts(num_questions)
-            
-            for context in contexts:
-                if not context.strip():
-                    continue
+            contexts = [
+                context for context in self._get_diverse_contexts(num_questions, document)
+                if context.strip()
+            ]
+            if not contexts:
+                raise ValueError("Failed to generate any valid questions")
 
-                # Generate a question based on the context
-                question = self._generate_question_from_context(context)
-                
-                # Get answer using the same QA process
-                answer = self.get_answer(question)
-                
-                questions.append(QuestionResponse(
+            # Generate a question based on each context, to be answered with the same QA process
+            generated = [self._generate_question_from_context(context) for context in contexts]
+            return contexts, self.retrieve_answers(generated, document.doc_id, session_id)
+        except Exception as e:
+            logger.exception("Error in generate_questions: %s", e)
+            raise
+
+    def finish_challenge(
+        self,
+        contexts: List[str],
+        pending: PendingAnswers,
+        cancelled: Optional[threading.Event] = None
+    ) -> List[QuestionResponse]:
+        """QA model half of ``generate_questions``: answer all the questions in one batch"""
+        try:
+            answers = self.finish_answers(pending, cancelled)
+            return [
+                QuestionResponse(
                     question=question,
                     answer=answer.answer,
-                    context=context
-                ))
-            
-            if not questions:
-                raise ValueError("Failed to generate any valid questions")
-            
-            return questions
+                    context=context,
+                    doc_id=pending.doc_id,
+                    score=answer.score,
+                    page=answer.page,
+                    start=answer.start,
+                    end=answer.end
+                )
+                for question, answer, context in zip(pending.questions, answers, contexts)
+            ]
         except Exception as e:
-            print(f"Error in generate_questions: {str(e)}")
+            logger.exception("Error in generate_questions: %s", e)
             raise
 
-    def evaluate_answer(self, question: str, user_answer: str) -> dict:
-        """Evaluate user's answer to a challenge question"""
+    def evaluate_answer(
+        self,
+        question: str,
+        user_answer: str,
+        doc_id: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID,
+        reference_answer: Optional[str] = None,
+        reference_context: Optional[str] = None
+    ) -> dict:
+        """Evaluate user's answer to a challenge question.
+
+        Challenge questions carry their reference answer, so when it is passed
+        back this is a plain comparison; otherwise the answer is looked up (usually
+        from the answer cache) or computed.
+        """
         if not question.strip() or not user_answer.strip():
             raise ValueError("Question and answer cannot be empty")
 
         try:
             # Get the correct answer and context
-            result = self.get_answer(question)
+            if reference_answer is None:
+                result = self.get_answer(question, doc_id, session_id)
+                reference_answer, reference_context = result.answer, result.context
             
             # Compare user's answer with the correct answer
-            similarity_score = self._calculate_similarity(user_answer, result.answer)
+            similarity_score = self._calculate_similarity(user_answer, reference_answer)
             
             is_correct = similarity_score > 0.8
-            feedback = self._generate_feedback(is_correct, result.answer)
+            feedback = self._generate_feedback(is_correct, reference_answer)
             
             return {
                 "is_correct": is_correct,
                 "feedback": feedback,
-                "reference": result.context
+                "reference": reference_context or ""
             }
         except Exception as e:
-            print(f"Error in evaluate_answer: {str(e)}")
+            logger.exception("Error in evaluate_answer: %s", e)
             raise
 
-    def _get_diverse_contexts(self, num_contexts: int) -> List[str]:
+    def _get_document(self, doc_id: Optional[str], session_id: str) -> DocumentEntry:
+        """Look up a document, defaulting to the session's most recent upload"""
+        if doc_id:
+            document = self.state.get_document(doc_id, session_id)
+            if not document:
+                raise ValueError(f"Document {doc_id} was not found. Please upload it again.")
+        else:
+            document = self.state.get_latest_document(session_id)
+            if not document:
+                raise ValueError("No document has been uploaded yet. Please upload a document first.")
+        return document
+
+    def _get_diverse_contexts(self, num_contexts: int, document: DocumentEntry) -> List[str]:
         """Get diverse contexts from the document for question generation"""
-        vector_store = self.state.get_vector_store()
-        if not vector_store:
-            raise ValueError("No document has been processed yet")
-        
         try:
-            # Use diverse queries to get different parts of the document
+            # Use diverse queries to steer selection towards different kinds of passages
             diverse_queries = [
                 "definition explanation describe concept",
                 "example case study demonstration",
@@ -153,49 +532,18 @@ class QAService:
                 "benefit advantage importance",
                 "limitation drawback concern"
             ]
+
+            # Relevant to some query, unlike the chunks already picked
+            docs = self.document_processor.get_diverse_documents(
+                diverse_queries, num_contexts, doc_id=document.doc_id, session_id=document.session_id
+            )
+            contexts = [doc.page_content for doc in docs if doc.page_content.strip()]
             
-            contexts = []
-            used_contexts = set()  # Track used contexts to avoid duplicates
-            
-            # Try queries until we have enough unique contexts
-            for query in diverse_queries:
-                if len(contexts) >= num_contexts:
-                    break
-                    
-                context = self.document_processor.get_relevant_context(query, k=1)
-                # Only add if the context is unique (not too similar to existing ones)
-                if context.strip() and not self._is_context_similar(context, used_contexts):
-                    contexts.append(context)
-                    used_contexts.add(context)
-            
-            # If we still need more contexts, get them from different parts of the document
-            if len(contexts) < num_contexts:
-                full_doc = self.state.get_current_document() or ""
-                paragraphs = [p.strip() for p in full_doc.split('\n\n') if p.strip()]
-                
-                # Try to get contexts from different parts of the document
-                step = max(1, len(paragraphs) // (num_contexts - len(contexts)))
-                for i in range(0, len(paragraphs), step):
-                    if len(contexts) >= num_contexts:
-                        break
-                    context = paragraphs[i]
-                    if context and not self._is_context_similar(context, used_contexts):
-                        contexts.append(context)
-                        used_contexts.add(context)
-            
-            return contexts or [self.state.get_current_document() or ""]
+            return contexts or [document.content or ""]
         except Exception as e:
-            print(f"Error in _get_diverse_contexts: {str(e)}")
+            logger.exception("Error in _get_diverse_contexts: %s", e)
             raise
 
-    def _is_context_similar(self, new_context: str, existing_contexts: set) -> bool:
-        """Check if a context is too similar to existing ones"""
-        for existing in existing_contexts:
-            similarity = self._calculate_similarity(new_context, existing)
-            if similarity > 0.7:  # Adjust threshold as needed
-                return True
-        return False
-
     def _generate_question_from_context(self, context: str) -> str:
         """Generate a question from a given context"""
         try:
@@ -260,7 +608,7 @@ class QAService:
             return random.choice(fallback_templates)
             
         except Exception as e:
-            print(f"Error in _generate_question_from_context: {str(e)}")
+            logger.exception("Error in _generate_question_from_context: %s", e)
             return "What is the main point of this text?"
 
     def _calculate_similarity(self, text1: str, text2: str) -> float:
@@ -278,7 +626,7 @@ class QAService:
             
             return len(intersection) / len(union)
         except Exception as e:
-            print(f"Error in _calculate_similarity: {str(e)}")
+            logger.exception("Error in _calculate_similarity: %s", e)
             return 0.0
 
     def _generate_feedback(self, is_correct: bool, correct_answer: str) -> str:
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+def write_json(path: str, data: dict):
+    """Write JSON atomically, so readers in other processes never see a partial file"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, staging = tempfile.mkstemp(dir=directory, prefix=".staging-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(staging, path)
+    except BaseException:
+        try:
+            os.remove(staging)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class SharedDocumentRegistry:
+    """Directory of document records shared by every server worker.
+
+    A record maps a ``doc_id`` to its session, filename and content hash. The
+    index, chunks and text it points at live in the index cache, so any worker
+    can open a document another one indexed by reading its own copy of them.
+    Records expire ``idle_seconds`` after any worker last used them.
+    """
+
+    # Refresh a record's last use at most this often per worker
+    TOUCH_INTERVAL = 60.0
+
+    def __init__(self, directory: str, idle_seconds: float):
+        self.directory = os.path.join(directory, "documents")
+        self.idle_seconds = idle_seconds
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, doc_id: str, session_id: str, filename: str, content_hash: str, created_at: float):
+        if not self._valid(doc_id):
+            raise ValueError(f"Invalid document ID: {doc_id}")
+        write_json(self._path(doc_id, session_id), {
+            "doc_id": doc_id,
+            "session_id": session_id,
+            "filename": filename,
+            "content_hash": content_hash,
+            "created_at": created_at,
+        })
+
+    def get(self, doc_id: str, session_id: str) -> Optional[dict]:
+        # IDs come from requests; anything that is not one of ours simply does not exist
+        if not self._valid(doc_id):
+            return None
+        path = self._path(doc_id, session_id)
+        record = read_json(path)
+        if record is None or self._expired(path):
+            return None
+        return record
+
+    def list(self, session_id: str) -> List[dict]:
+        """A session's live records, oldest first; expired ones are removed"""
+        directory = self._session_dir(session_id)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+
+        records = []
+        for name in names:
+            if name.startswith(".") or not name.endswith(".json"):
+                continue
+            path = os.path.join(directory, name)
+            if self._expired(path):
+                self._remove(path)
+                continue
+            record = read_json(path)
+            if record is not None:
+                records.append(record)
+        return sorted(records, key=lambda record: record["created_at"])
+
+    def session_mtime(self, session_id: str) -> int:
+        """Changes whenever a record is added to or removed from the session"""
+        try:
+            return os.stat(self._session_dir(session_id)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def touch(self, doc_id: str, session_id: str):
+        if not self._valid(doc_id):
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._touched.get(doc_id, 0.0) < self.TOUCH_INTERVAL:
+                return
+            if len(self._touched) > 4096:
+                self._touched = {
+                    name: touched for name, touched in self._touched.items() if now - touched < self.TOUCH_INTERVAL
+                }
+            self._touched[doc_id] = now
+        try:
+            os.utime(self._path(doc_id, session_id))
+        except FileNotFoundError:
+            pass
+
+    def _expired(self, path: str) -> bool:
+        if self.idle_seconds <= 0:
+            return False
+        try:
+            return time.time() - os.stat(path).st_mtime > self.idle_seconds
+        except FileNotFoundError:
+            return True
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _session_dir(self, session_id: str) -> str:
+        # Session IDs come from a request header, so never use them as paths directly
+        return os.path.join(self.directory, hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32])
+
+    @staticmethod
+    def _valid(doc_id: str) -> bool:
+        # Document IDs become file names, so only accept what new_document_id produces
+        return doc_id.isalnum()
+
+    def _path(self, doc_id: str, session_id: str) -> str:
+        return os.path.join(self._session_dir(session_id), f"{doc_id}.json")
@@ -0,0 +1,40 @@
+from typing import Tuple
+
+import torch
+
+
+def decode_best_spans(
+    start_logits: torch.Tensor,
+    end_logits: torch.Tensor,
+    context_mask: torch.Tensor,
+    max_answer_tokens: int
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Find the best valid answer span in every window of a batch.
+
+    A span is valid when both ends fall on context tokens, ``start <= end`` and
+    it is at most ``max_answer_tokens`` long. Start and end are chosen jointly
+    by maximizing ``start_logit + end_logit`` over all valid pairs.
+
+    Args:
+        start_logits: ``(windows, seq_len)`` start scores from the QA model
+        end_logits: ``(windows, seq_len)`` end scores from the QA model
+        context_mask: ``(windows, seq_len)`` boolean mask of context tokens
+        max_answer_tokens: longest allowed answer, in tokens
+
+    Returns:
+        ``(starts, ends, scores)``, one entry per window. Windows without any
+        context tokens get a score of ``-inf``.
+    """
+    seq_len = start_logits.shape[-1]
+    scores = start_logits.unsqueeze(2) + end_logits.unsqueeze(1)
+
+    # Allow end - start in [0, max_answer_tokens) only
+    positions = torch.arange(seq_len, device=start_logits.device)
+    offsets = positions.unsqueeze(0) - positions.unsqueeze(1)
+    valid = (offsets >= 0) & (offsets < max_answer_tokens)
+    valid = valid.unsqueeze(0) & context_mask.unsqueeze(2) & context_mask.unsqueeze(1)
+
+    scores = scores.masked_fill(~valid, float("-inf"))
+    best = scores.flatten(1).argmax(dim=1)
+    best_scores = scores.flatten(1).gather(1, best.unsqueeze(1)).squeeze(1)
+    return best // seq_len, best % seq_len, best_scores
@@ -1,28 +1,302 @@
-from typing import Optional
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
 from langchain_community.vectorstores.faiss import FAISS
+from langchain_core.documents import Document
+
+from config import (
+    BM25_B,
+    BM25_K1,
+    DEFAULT_SESSION_ID,
+    DOCUMENT_IDLE_SECONDS,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+    IVF_NPROBE,
+    MAX_DOCUMENTS,
+    VECTOR_INDEX_FLAT_MAX,
+    VECTOR_INDEX_LARGE,
+    VECTOR_INDEX_TYPE,
+)
+from .lexical_index import LexicalIndex
+from .shared_state import SharedDocumentRegistry
+from .vector_store import VectorIndex
+
+
+class DocumentEntry:
+    """A processed document with its vector and lexical indexes"""
+
+    def __init__(
+        self,
+        doc_id: str,
+        session_id: str,
+        filename: str,
+        content: str,
+        vector_store: FAISS,
+        content_hash: str
+    ):
+        self.doc_id = doc_id
+        self.session_id = session_id
+        self.filename = filename
+        self.content = content
+        self.vector_store = vector_store
+        self.content_hash = content_hash
+        self.summary: Optional[str] = None
+        # Built alongside the vector store, or from its chunks when missing
+        self.lexical_index: Optional[LexicalIndex] = None
+        self.created_at = time.time()
+        self.last_access = self.created_at
+
+    def touch(self):
+        self.last_access = time.time()
+
 
 class DocumentState:
+    """Process-wide registry of documents keyed by document ID and session.
+
+    Documents are kept in LRU order and idle ones are evicted once the registry
+    grows past ``max_documents`` or they exceed ``idle_seconds`` without access.
+    Each session also gets shared vector and lexical indexes spanning all of
+    its documents, using the same chunk IDs in both. They are built on first
+    use and then updated in place as documents are added and removed.
+
+    With a shared registry (see ``share``), documents are also published for
+    the other server workers, and ones uploaded through another worker are
+    opened from the shared index cache the first time they are asked for.
+    Eviction only ever drops the local copy.
+    """
     _instance = None
-    vector_store: Optional[FAISS] = None
-    current_document: Optional[str] = None
+    _lock = threading.RLock()
+    documents: "OrderedDict[str, DocumentEntry]" = OrderedDict()
+    session_stores: Dict[str, VectorIndex] = {}
+    session_lexical: Dict[str, LexicalIndex] = {}
+    max_documents: int = MAX_DOCUMENTS
+    idle_seconds: float = DOCUMENT_IDLE_SECONDS
+    shared: Optional[SharedDocumentRegistry] = None
+    loader: Optional[Callable[[dict], Optional[DocumentEntry]]] = None
+    # Per session: the registry directory mtime and the documents it held when last synced
+    _synced: Dict[str, Tuple[int, frozenset]] = {}
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(DocumentState, cls).__new__(cls)
         return cls._instance
 
+    @staticmethod
+    def new_document_id() -> str:
+        return uuid.uuid4().hex
+
+    @classmethod
+    def share(cls, registry: SharedDocumentRegistry, loader: Callable[[dict], Optional[DocumentEntry]]):
+        """Share documents with other workers; ``loader`` opens a registry record as a DocumentEntry"""
+        with cls._lock:
+            cls.shared = registry
+            cls.loader = loader
+            cls._synced = {}
+
+    @classmethod
+    def add_document(cls, entry: DocumentEntry, publish: bool = True) -> DocumentEntry:
+        if publish and cls.shared is not None:
+            cls.shared.publish(entry.doc_id, entry.session_id, entry.filename, entry.content_hash, entry.created_at)
+        with cls._lock:
+            cls.documents[entry.doc_id] = entry
+            cls.documents.move_to_end(entry.doc_id)
+            if entry.lexical_index is None:
+                entry.lexical_index = LexicalIndex.from_texts(cls._texts(entry.vector_store), BM25_K1, BM25_B)
+
+            if entry.session_id in cls.session_stores:
+                cls._add_to_session(entry)
+
+            cls._evict()
+            return entry
+
+    @classmethod
+    def get_document(cls, doc_id: str, session_id: str = DEFAULT_SESSION_ID) -> Optional[DocumentEntry]:
+        with cls._lock:
+            entry = cls.documents.get(doc_id)
+            if entry is not None and entry.session_id == session_id:
+                entry.touch()
+                cls.documents.move_to_end(doc_id)
+        if entry is None and cls.shared is not None:
+            entry = cls._load_shared(cls.shared.get(doc_id, session_id))
+        if entry is None or entry.session_id != session_id:
+            return None
+        if cls.shared is not None:
+            cls.shared.touch(doc_id, session_id)
+        return entry
+
+    @classmethod
+    def get_open_document(cls, doc_id: str, session_id: str = DEFAULT_SESSION_ID) -> Optional[DocumentEntry]:
+        """A document this worker already has open; never loads one from the shared registry"""
+        with cls._lock:
+            entry = cls.documents.get(doc_id)
+            return entry if entry is not None and entry.session_id == session_id else None
+
+    @classmethod
+    def list_open_documents(cls, session_id: str = DEFAULT_SESSION_ID) -> Optional[List[DocumentEntry]]:
+        """The session's documents if this worker has every one of them open, else None; never loads any"""
+        with cls._lock:
+            entries = [entry for entry in cls.documents.values() if entry.session_id == session_id]
+            if cls.shared is None:
+                return entries
+            synced = cls._synced.get(session_id)
+        if synced is None or synced[0] != cls.shared.session_mtime(session_id):
+            return None
+        # Documents evicted here are still part of the session
+        if not synced[1] <= {entry.doc_id for entry in entries}:
+            return None
+        return entries
+
+    @classmethod
+    def get_latest_document(cls, session_id: str = DEFAULT_SESSION_ID) -> Optional[DocumentEntry]:
+        """The session's most recently uploaded document, however recently the others were used"""
+        entries = cls.list_documents(session_id)
+        if not entries:
+            return None
+        latest = max(entries, key=lambda entry: entry.created_at)
+        return cls.get_document(latest.doc_id, session_id)
+
     @classmethod
-    def set_vector_store(cls, store: FAISS):
-        cls.vector_store = store
+    def list_documents(cls, session_id: str = DEFAULT_SESSION_ID) -> List[DocumentEntry]:
+        cls._sync_session(session_id)
+        with cls._lock:
+            return [entry for entry in cls.documents.values() if entry.session_id == session_id]
+
+    @classmethod
+    def remove_document(cls, doc_id: str):
+        with cls._lock:
+            entry = cls.documents.pop(doc_id, None)
+            store = cls.session_stores.get(entry.session_id) if entry is not None else None
+            if store is not None:
+                cls.session_lexical[entry.session_id].remove(store.remove(doc_id))
+                if not store.ntotal:
+                    cls.session_stores.pop(entry.session_id, None)
+                    cls.session_lexical.pop(entry.session_id, None)
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Document counts and the approximate memory held by their text and vectors"""
+        with cls._lock:
+            entries = list(cls.documents.values())
+            document_vectors = sum(entry.vector_store.index.ntotal for entry in entries)
+            return {
+                "documents": len(entries),
+                "sessions": len({entry.session_id for entry in entries}),
+                "text_chars": sum(len(entry.content) for entry in entries),
+                "document_vectors": document_vectors,
+                # float32 vectors, all on this process's heap: every worker reads its own copy of an
+                # index, and session indexes copy their documents' vectors again
+                "document_index_bytes": sum(
+                    entry.vector_store.index.ntotal * entry.vector_store.index.d * 4 for entry in entries
+                ),
+                "session_vectors": sum(store.ntotal for store in cls.session_stores.values()),
+                "session_index_bytes": sum(store.ntotal * store.dim * 4 for store in cls.session_stores.values()),
+            }
+
+    @classmethod
+    def get_session_store(cls, session_id: str = DEFAULT_SESSION_ID) -> Optional[VectorIndex]:
+        """Return the cross-document index for a session, building it if needed"""
+        cls._sync_session(session_id)
+        with cls._lock:
+            store = cls.session_stores.get(session_id)
+            if store is not None:
+                return store
+
+            entries = cls.list_documents(session_id)
+            if not entries:
+                return None
+
+            cls.session_stores[session_id] = VectorIndex(
+                entries[0].vector_store.index.d,
+                index_type=VECTOR_INDEX_TYPE,
+                flat_max=VECTOR_INDEX_FLAT_MAX,
+                large_type=VECTOR_INDEX_LARGE,
+                nprobe=IVF_NPROBE,
+                hnsw_m=HNSW_M,
+                ef_search=HNSW_EF_SEARCH
+            )
+            cls.session_lexical[session_id] = LexicalIndex(BM25_K1, BM25_B)
+            for entry in entries:
+                cls._add_to_session(entry)
+            return cls.session_stores[session_id]
 
     @classmethod
-    def set_current_document(cls, document: str):
-        cls.current_document = document
+    def get_session_lexical(cls, session_id: str = DEFAULT_SESSION_ID) -> Optional[LexicalIndex]:
+        """Return the cross-document lexical index for a session, building it if needed"""
+        with cls._lock:
+            if cls.get_session_store(session_id) is None:
+                return None
+            return cls.session_lexical[session_id]
 
     @classmethod
-    def get_vector_store(cls) -> Optional[FAISS]:
-        return cls.vector_store
+    def _add_to_session(cls, entry: DocumentEntry):
+        """Copy a document's chunks into its session's indexes under shared chunk IDs"""
+        docs = cls._chunks(entry.vector_store)
+        if not docs:
+            return
+        ids = cls.session_lexical[entry.session_id].add(doc.page_content for doc in docs)
+        # Reconstruct rather than merge_from, which would empty the per-document store
+        vectors = entry.vector_store.index.reconstruct_n(0, len(docs))
+        cls.session_stores[entry.session_id].add(entry.doc_id, vectors, docs, ids)
 
     @classmethod
-    def get_current_document(cls) -> Optional[str]:
-        return cls.current_document 
\ No newline at end of file
+    def _load_shared(cls, record: Optional[dict]) -> Optional[DocumentEntry]:
+        """Open a document another worker registered; loading happens outside the lock"""
+        if record is None or cls.loader is None:
+            return None
+        with cls._lock:
+            entry = cls.documents.get(record["doc_id"])
+        if entry is None:
+            entry = cls.loader(record)
+            if entry is None:
+                return None
+            with cls._lock:
+                # Another request may have loaded it in the meantime
+                entry = cls.documents.get(entry.doc_id) or cls.add_document(entry, publish=False)
+        return entry
+
+    @classmethod
+    def _sync_session(cls, session_id: str):
+        """Open the documents other workers have added to the session since the last sync.
+
+        Documents evicted here are not reopened by a sync, only when asked for by ID.
+        """
+        if cls.shared is None:
+            return
+        mtime = cls.shared.session_mtime(session_id)
+        with cls._lock:
+            synced = cls._synced.get(session_id)
+            if synced is not None and synced[0] == mtime:
+                return
+            known = synced[1] if synced is not None else frozenset()
+
+        records = cls.shared.list(session_id)
+        for record in records:
+            if record["doc_id"] not in known:
+                cls._load_shared(record)
+        with cls._lock:
+            cls._synced[session_id] = (mtime, frozenset(record["doc_id"] for record in records))
+
+    @staticmethod
+    def _chunks(store: FAISS) -> List[Document]:
+        """Chunks in index order"""
+        return [store.docstore.search(store.index_to_docstore_id[i]) for i in range(store.index.ntotal)]
+
+    @classmethod
+    def _texts(cls, store: FAISS) -> List[str]:
+        return [doc.page_content for doc in cls._chunks(store)]
+
+    @classmethod
+    def _evict(cls):
+        """Drop idle documents and then least recently used ones over the limit"""
+        now = time.time()
+        if cls.idle_seconds > 0:
+            for doc_id, entry in list(cls.documents.items()):
+                if now - entry.last_access > cls.idle_seconds:
+                    cls.remove_document(doc_id)
+
+        while len(cls.documents) > cls.max_documents:
+            doc_id = next(iter(cls.documents))
+            cls.remove_document(doc_id)
@@ -0,0 +1,158 @@
+import threading
+from typing import Callable, List, Optional
+
+from transformers.pipelines import SummarizationPipeline
+
+from models.document import Chunk
+from .inference import InferenceCancelled
+
+
+class MapReduceSummarizer:
+    """Hierarchical map-reduce summarization over token-sized chunks.
+
+    The text is split into chunks that fit the model's input window, each
+    chunk is summarized in batches (map), and the partial summaries are packed
+    into new model-sized inputs and summarized again (reduce) until a single
+    summary remains. Every reduce level shrinks the input several times over,
+    so the number of levels grows only logarithmically with document length.
+
+    ``on_partial(stage, summaries)`` receives each batch's summaries as soon as
+    they are produced, and setting ``cancelled`` stops the work before the next
+    batch.
+    """
+
+    def __init__(
+        self,
+        summarizer: SummarizationPipeline,
+        batch_size: int = 4,
+        chunk_tokens: int = 900,
+        max_length: int = 150,
+        min_length: int = 30,
+        final_min_length: int = 50,
+        on_partial: Optional[Callable[[str, List[str]], None]] = None,
+        cancelled: Optional[threading.Event] = None
+    ):
+        self.summarizer = summarizer
+        self.tokenizer = summarizer.tokenizer
+        self.batch_size = max(1, batch_size)
+        # Leave room for the special tokens the pipeline adds
+        model_limit = self.tokenizer.model_max_length - self.tokenizer.num_special_tokens_to_add()
+        self.chunk_tokens = max(1, min(chunk_tokens, model_limit))
+        self.max_length = max_length
+        self.min_length = min_length
+        self.final_min_length = final_min_length
+        self.on_partial = on_partial
+        self.cancelled = cancelled
+
+    def summarize(self, text: str, progress: Optional[Callable[[str, int, Optional[int]], None]] = None) -> str:
+        """Summarize text of any length, reporting ``(stage, done, total)`` to ``progress``"""
+        return self._map_reduce(self.split_text(text), progress)
+
+    def summarize_chunks(
+        self,
+        content: str,
+        chunks: List[Chunk],
+        progress: Optional[Callable[[str, int, Optional[int]], None]] = None
+    ) -> str:
+        """Summarize a document from the chunks it was indexed with.
+
+        Consecutive chunks are packed into model-sized inputs by their token
+        counts, taking the text from ``content`` so overlapping chunks are not
+        summarized twice. The document is not tokenized again.
+        """
+        inputs = []
+        start, end, tokens = None, 0, 0
+        for chunk in sorted(chunks, key=lambda chunk: chunk.start):
+            if start is not None and tokens + chunk.token_count > self.chunk_tokens:
+                inputs.append(content[start:end].strip())
+                start, tokens = None, 0
+            if start is None:
+                start = max(chunk.start, end)
+            end = max(end, chunk.end)
+            tokens += chunk.token_count
+        if start is not None:
+            inputs.append(content[start:end].strip())
+        return self._map_reduce([text for text in inputs if text], progress)
+
+    def _map_reduce(
+        self,
+        chunks: List[str],
+        progress: Optional[Callable[[str, int, Optional[int]], None]] = None
+    ) -> str:
+        if not chunks:
+            return ""
+
+        summaries = self._summarize_batch(chunks, self.min_length, "summarizing", progress)
+        while len(summaries) > 1:
+            groups = self._pack(summaries)
+            min_length = self.final_min_length if len(groups) == 1 else self.min_length
+            summaries = self._summarize_batch(groups, min_length, "reducing", progress)
+        return summaries[0] if summaries else ""
+
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunks of at most ``chunk_tokens`` tokens"""
+        if not text.strip():
+            return []
+
+        encoding = self.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False
+        )
+        offsets = encoding["offset_mapping"]
+
+        chunks = []
+        for start in range(0, len(offsets), self.chunk_tokens):
+            window = offsets[start:start + self.chunk_tokens]
+            chunk = text[window[0][0]:window[-1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def _pack(self, summaries: List[str]) -> List[str]:
+        """Join consecutive summaries into inputs that fit the model"""
+        lengths = [
+            len(ids) for ids in self.tokenizer(summaries, add_special_tokens=False, verbose=False)["input_ids"]
+        ]
+
+        groups, current, current_tokens = [], [], 0
+        for summary, tokens in zip(summaries, lengths):
+            # Always put at least two summaries together so every level shrinks the input
+            if current and current_tokens + tokens > self.chunk_tokens and len(current) > 1:
+                groups.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(summary)
+            current_tokens += tokens
+        if current:
+            groups.append(" ".join(current))
+        return groups
+
+    def _summarize_batch(
+        self,
+        texts: List[str],
+        min_length: int,
+        stage: str,
+        progress: Optional[Callable[[str, int, Optional[int]], None]] = None
+    ) -> List[str]:
+        """Summarize several inputs, feeding them to the pipeline in batches"""
+        summaries = []
+        for start in range(0, len(texts), self.batch_size):
+            if self.cancelled is not None and self.cancelled.is_set():
+                raise InferenceCancelled()
+            batch = texts[start:start + self.batch_size]
+            outputs = self.summarizer(
+                batch,
+                batch_size=len(batch),
+                max_length=self.max_length,
+                min_length=min_length,
+                do_sample=False,
+                truncation=True
+            )
+            finished = [output["summary_text"] for output in outputs if output and output.get("summary_text")]
+            summaries.extend(finished)
+            if self.on_partial and finished:
+                self.on_partial(stage, finished)
+            if progress:
+                progress(stage, start + len(batch), len(texts))
+        return summaries
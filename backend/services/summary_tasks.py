@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from .document_processor import DocumentProcessor
+from .inference import InferenceCancelled, InferenceExecutor
+from .state import DocumentEntry
+
+Progress = Callable[[str, int, Optional[int]], None]
+
+
+class _SummaryTask:
+    """One running summary and the callers following it"""
+
+    def __init__(self):
+        self.partials: List[Tuple[str, Any]] = []
+        self.queues: List[asyncio.Queue] = []
+        self.progress: List[Progress] = []
+        self.task: Optional[asyncio.Task] = None
+        self.done = False
+        self._lock = threading.Lock()
+
+    def report(self, stage: str, done: int, total: Optional[int] = None):
+        """Progress callback for the summarizer; runs on the inference thread"""
+        with self._lock:
+            listeners = list(self.progress)
+        for listener in listeners:
+            listener(stage, done, total)
+
+    def subscribe(self, progress: Optional[Progress]) -> asyncio.Queue:
+        """A queue of this summary's events, starting with the partial summaries so far"""
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in self.partials:
+            queue.put_nowait(item)
+        self.queues.append(queue)
+        if progress is not None:
+            with self._lock:
+                self.progress.append(progress)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, progress: Optional[Progress]):
+        self.queues.remove(queue)
+        if progress is not None:
+            with self._lock:
+                self.progress.remove(progress)
+
+    def publish(self, event: str, data: Any):
+        if event != "result" and event != "error":
+            self.partials.append((event, data))
+        else:
+            self.done = True
+        for queue in self.queues:
+            queue.put_nowait((event, data))
+
+
+class SummaryTasks:
+    """Runs at most one summary per document, however many callers want it.
+
+    Upload jobs and summary streams follow the same task: partial summaries
+    are sent to every follower, and late followers first get the ones already
+    produced. The summarizer is only stopped once every follower has left.
+    """
+
+    def __init__(self, inference: InferenceExecutor, document_processor: DocumentProcessor):
+        self.inference = inference
+        self.document_processor = document_processor
+        self._tasks: Dict[str, _SummaryTask] = {}
+
+    def running(self, doc_id: str) -> bool:
+        return doc_id in self._tasks
+
+    async def follow(
+        self,
+        document: DocumentEntry,
+        progress: Optional[Progress] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield ``("partial", data)`` events, then ``("result", summary)``; errors are raised"""
+        if document.summary is not None:
+            yield "result", document.summary
+            return
+
+        summary = self._tasks.get(document.doc_id)
+        if summary is None:
+            summary = _SummaryTask()
+            self._tasks[document.doc_id] = summary
+            summary.task = asyncio.ensure_future(self._run(document, summary))
+
+        queue = summary.subscribe(progress)
+        try:
+            while True:
+                event, data = await queue.get()
+                if event == "error":
+                    raise data
+                yield event, data
+                if event == "result":
+                    return
+        finally:
+            summary.unsubscribe(queue, progress)
+            if not summary.queues and not summary.done:
+                # Nobody is left to read it; the next caller starts afresh
+                self._forget(document.doc_id, summary)
+                summary.task.cancel()
+
+    async def summarize(self, document: DocumentEntry, progress: Optional[Progress] = None) -> str:
+        """Wait for a document's summary, joining a running one if there is one"""
+        events = self.follow(document, progress)
+        try:
+            async for event, data in events:
+                if event == "result":
+                    return data
+            raise InferenceCancelled()
+        finally:
+            await events.aclose()
+
+    async def _run(self, document: DocumentEntry, summary: _SummaryTask):
+        def summarize(emit, cancelled):
+            return self.document_processor.get_summary(
+                document,
+                progress=summary.report,
+                on_partial=lambda stage, summaries: emit("partial", {"stage": stage, "summaries": summaries}),
+                cancelled=cancelled
+            )
+
+        events = self.inference.stream("summarizer", summarize)
+        try:
+            async for event, data in events:
+                summary.publish(event, data)
+        except asyncio.CancelledError:
+            summary.publish("error", InferenceCancelled())
+        except Exception as e:
+            summary.publish("error", e)
+        finally:
+            # Stops the summarizer between batches if it is still running
+            await events.aclose()
+            self._forget(document.doc_id, summary)
+
+    def _forget(self, doc_id: str, summary: _SummaryTask):
+        if self._tasks.get(doc_id) is summary:
+            del self._tasks[doc_id]
@@ -0,0 +1,215 @@
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores.faiss import FAISS
+from langchain_core.documents import Document
+
+INDEX_TYPES = ("auto", "flat", "ivf", "hnsw")
+
+
+class VectorIndex:
+    """FAISS index over the chunks of many documents, with per-document add and remove.
+
+    The index type follows the corpus size: exact flat search up to
+    ``flat_max`` chunks, then ``large_type`` (IVF or HNSW). Switching types,
+    or retraining IVF once the corpus has grown well past the data it was
+    trained on, rebuilds from the stored vectors; ordinary adds and removes
+    never do. HNSW cannot delete vectors, so removed chunks are tombstoned,
+    filtered from results, and compacted away once they make up a quarter of
+    the index.
+
+    Chunk IDs are assigned by the caller (or sequentially) and never reused,
+    so they can be shared with other indexes over the same chunks.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        index_type: str = "auto",
+        flat_max: int = 50000,
+        large_type: str = "ivf",
+        nprobe: int = 16,
+        hnsw_m: int = 32,
+        ef_search: int = 64,
+        ef_construction: int = 80
+    ):
+        if index_type not in INDEX_TYPES or large_type not in ("ivf", "hnsw"):
+            raise ValueError(f"Unknown vector index type: {index_type}/{large_type}")
+        self.dim = dim
+        self.index_type = index_type
+        self.flat_max = flat_max
+        self.large_type = large_type
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.ef_construction = ef_construction
+        self.kind = "flat" if index_type == "auto" else index_type
+        self._index = None
+        self._trained_size = 0
+        self._documents: Dict[int, Document] = {}
+        self._chunk_ids: Dict[str, List[int]] = {}
+        self._tombstones: set = set()
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    @property
+    def ntotal(self) -> int:
+        """Number of live chunks"""
+        return len(self._documents)
+
+    def add(self, doc_id: str, vectors: np.ndarray, documents: List[Document], ids: Optional[Sequence[int]] = None) -> List[int]:
+        """Add a document's chunks and return their IDs"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if ids is None:
+            ids = list(range(self._next_id, self._next_id + len(vectors)))
+        ids = [int(i) for i in ids]
+        if not ids:
+            return []
+
+        with self._lock:
+            self._next_id = max(self._next_id, max(ids) + 1)
+            if self._index is None or self._wanted_kind(self.ntotal + len(ids)) != self.kind or self._needs_retraining(len(ids)):
+                self._rebuild(extra=(ids, vectors))
+            else:
+                self._index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+            for chunk_id, document in zip(ids, documents):
+                self._documents[chunk_id] = document
+            self._chunk_ids.setdefault(doc_id, []).extend(ids)
+            return ids
+
+    def remove(self, doc_id: str) -> List[int]:
+        """Remove a document's chunks and return their IDs"""
+        with self._lock:
+            ids = self._chunk_ids.pop(doc_id, [])
+            if not ids:
+                return []
+            for chunk_id in ids:
+                self._documents.pop(chunk_id, None)
+            if self.kind == "hnsw":
+                self._tombstones.update(ids)
+                if len(self._tombstones) * 4 > self._index.ntotal:
+                    self._rebuild()
+            else:
+                self._index.remove_ids(np.asarray(ids, dtype=np.int64))
+            return ids
+
+    def search(self, vectors: np.ndarray, k: int) -> np.ndarray:
+        """IDs of the ``k`` nearest live chunks for each query, padded with -1"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            if self._index is None or not self.ntotal:
+                return np.full((len(vectors), k), -1, dtype=np.int64)
+            # Ask for enough extra results to cover tombstoned chunks
+            fetch = min(k + len(self._tombstones), self._index.ntotal)
+            _, found = self._index.search(vectors, fetch)
+            tombstones = self._tombstones
+
+        results = np.full((len(vectors), k), -1, dtype=np.int64)
+        for row, ids in enumerate(found):
+            live = [i for i in ids if i >= 0 and i not in tombstones][:k]
+            results[row, :len(live)] = live
+        return results
+
+    def document(self, chunk_id: int) -> Document:
+        return self._documents[int(chunk_id)]
+
+    def ids(self) -> np.ndarray:
+        with self._lock:
+            return np.fromiter(self._documents, dtype=np.int64, count=len(self._documents))
+
+    def reconstruct(self, ids: Sequence[int]) -> np.ndarray:
+        with self._lock:
+            return self._index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "type": self.kind,
+                "chunks": self.ntotal,
+                "documents": len(self._chunk_ids),
+                "tombstones": len(self._tombstones),
+            }
+
+    def _wanted_kind(self, size: int) -> str:
+        if self.index_type != "auto":
+            return self.index_type
+        return "flat" if size <= self.flat_max else self.large_type
+
+    def _needs_retraining(self, adding: int) -> bool:
+        # IVF centroids go stale once the corpus is several times what they were trained on
+        return self.kind == "ivf" and self.ntotal + adding > 4 * max(self._trained_size, 1)
+
+    def _rebuild(self, extra: Optional[Tuple[List[int], np.ndarray]] = None):
+        """Recreate the index from the live vectors (plus ``extra``), choosing its type by size"""
+        ids = self.ids()
+        vectors = self.reconstruct(ids) if len(ids) else np.zeros((0, self.dim), dtype=np.float32)
+        if extra is not None:
+            ids = np.concatenate([ids, np.asarray(extra[0], dtype=np.int64)])
+            vectors = np.vstack([vectors, extra[1]])
+
+        self.kind = self._wanted_kind(len(ids))
+        self._index = self._create_index(self.kind, vectors)
+        self._trained_size = len(ids)
+        self._tombstones = set()
+        if len(ids):
+            self._index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), ids)
+
+    def _create_index(self, kind: str, training: np.ndarray):
+        if kind == "hnsw":
+            hnsw = faiss.IndexHNSWFlat(self.dim, self.hnsw_m)
+            hnsw.hnsw.efConstruction = self.ef_construction
+            hnsw.hnsw.efSearch = self.ef_search
+            return faiss.IndexIDMap2(hnsw)
+
+        if kind == "ivf" and len(training) >= 64:
+            # About 4 * sqrt(n) lists, with enough points per centroid to train them
+            nlist = max(1, int(min(65536, 4 * math.sqrt(len(training)), len(training) // 39)))
+            ivf = faiss.IndexIVFFlat(faiss.IndexFlatL2(self.dim), self.dim, nlist)
+            # Train on a sample; a few dozen points per centroid is plenty
+            sample = training
+            if len(training) > 64 * nlist:
+                rows = np.random.default_rng(0).choice(len(training), 64 * nlist, replace=False)
+                sample = training[rows]
+            ivf.train(np.ascontiguousarray(sample, dtype=np.float32))
+            ivf.nprobe = self.nprobe
+            # A hash table direct map allows reconstructing and removing by ID
+            ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+            return ivf
+
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(self.dim))
+
+
+Store = Union[FAISS, VectorIndex]
+
+
+def store_size(store: Store) -> int:
+    """Number of chunks in a per-document FAISS store or a VectorIndex"""
+    return store.ntotal if isinstance(store, VectorIndex) else store.index.ntotal
+
+
+def search_store(store: Store, vectors: np.ndarray, k: int) -> np.ndarray:
+    """Chunk IDs of the nearest neighbours of each vector, padded with -1"""
+    if isinstance(store, VectorIndex):
+        return store.search(vectors, k)
+    return store.index.search(np.ascontiguousarray(vectors, dtype=np.float32), k)[1]
+
+
+def store_document(store: Store, chunk_id: int) -> Document:
+    if isinstance(store, VectorIndex):
+        return store.document(chunk_id)
+    return store.docstore.search(store.index_to_docstore_id[int(chunk_id)])
+
+
+def store_ids(store: Store) -> np.ndarray:
+    if isinstance(store, VectorIndex):
+        return store.ids()
+    return np.arange(store.index.ntotal)
+
+
+def store_vectors(store: Store, ids: Sequence[int]) -> np.ndarray:
+    if isinstance(store, VectorIndex):
+        return store.reconstruct(ids)
+    return store.index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
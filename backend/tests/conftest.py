@@ -0,0 +1,57 @@
+"""Run the app in-process against the tiny benchmark models.
+
+Configuration is read when the app is imported, so the environment is set up
+here, before any test module imports it.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.tiny_models import build_tiny_models  # noqa: E402
+
+WORK_DIR = tempfile.mkdtemp(prefix="docai-tests-")
+_paths = build_tiny_models(os.path.join(BACKEND_DIR, ".cache", "tiny-models"))
+os.environ.update({
+    "HF_HUB_OFFLINE": "1",
+    "TRANSFORMERS_OFFLINE": "1",
+    "TOKENIZERS_PARALLELISM": "false",
+    "LOG_LEVEL": "WARNING",
+    "QA_MODEL": _paths["qa_model"],
+    "SUMMARIZER_MODEL": _paths["summarizer"],
+    "EMBEDDING_MODEL": _paths["embeddings"],
+    "INDEX_CACHE_DIR": os.path.join(WORK_DIR, "indexes"),
+    "SHARED_STATE_DIR": "",
+})
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def upload(client, filename: str, data: bytes, session_id: str = "default", timeout: float = 120.0) -> dict:
+    """Upload a document without summarizing it and wait for its job to finish"""
+    headers = {"X-Session-Id": session_id}
+    response = client.post(
+        "/upload", files={"file": (filename, data)}, params={"summarize": "false"}, headers=headers
+    )
+    assert response.status_code == 202, response.text
+    job_id = response.json()["job_id"]
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Upload job {job_id} did not finish in {timeout}s")
@@ -0,0 +1,106 @@
+import concurrent.futures
+import threading
+import time
+
+from benchmarks.synthetic import generate_text
+from config import INFERENCE_CONCURRENCY
+
+from conftest import upload
+
+
+def test_ask_while_uploading(client):
+    """Questions keep working while another upload is being chunked"""
+    doc_id = upload(client, "small.txt", generate_text(2, seed=11).encode())["doc_id"]
+    response = client.post(
+        "/upload", files={"file": ("large.txt", generate_text(200, seed=12).encode())}, params={"summarize": "false"}
+    )
+    job_id = response.json()["job_id"]
+
+    statuses = []
+    job = client.get(f"/jobs/{job_id}").json()
+    while job["status"] not in ("completed", "failed"):
+        # Distinct questions, so none of them is answered from the cache
+        answer = client.post("/ask", json={"question": f"What happened in year {len(statuses)}?", "doc_id": doc_id})
+        statuses.append(answer.status_code)
+        job = client.get(f"/jobs/{job_id}").json()
+
+    assert job["status"] == "completed", job["error"]
+    assert statuses and set(statuses) == {200}
+
+
+def test_uploads_do_not_hold_the_embeddings_slot(client):
+    """Two uploads in flight (the default embeddings limit) leave room to answer questions"""
+    doc_id = upload(client, "small.txt", generate_text(2, seed=21).encode())["doc_id"]
+    job_ids = [
+        client.post(
+            "/upload",
+            files={"file": (f"large{seed}.txt", generate_text(300, seed=seed).encode())},
+            params={"summarize": "false"}
+        ).json()["job_id"]
+        for seed in (22, 23)
+    ]
+    # Wait until both are embedding; before the fix they then held both embeddings slots
+    while any("embedding" not in client.get(f"/jobs/{job_id}").json()["progress"] for job_id in job_ids):
+        time.sleep(0.01)
+
+    answer = client.post("/ask", json={"question": "Who signed the agreement?", "doc_id": doc_id})
+    jobs = [client.get(f"/jobs/{job_id}").json() for job_id in job_ids]
+
+    assert answer.status_code == 200
+    assert all(job["status"] == "running" for job in jobs)
+
+
+class HeldSlots:
+    """Occupies every slot of a model on the app's event loop until released"""
+
+    def __init__(self, client, model: str):
+        import main
+
+        self.released = threading.Event()
+        self.futures = [
+            client.portal.start_task_soon(main.inference.run, model, self.released.wait)
+            for _ in range(INFERENCE_CONCURRENCY[model])
+        ]
+
+    def release(self):
+        self.released.set()
+        for future in self.futures:
+            future.result(timeout=10)
+
+
+def in_thread(fn, *args, **kwargs) -> concurrent.futures.Future:
+    return concurrent.futures.ThreadPoolExecutor(max_workers=1).submit(fn, *args, **kwargs)
+
+
+def test_cached_answers_take_no_model_slot(client):
+    doc_id = upload(client, "cached.txt", generate_text(2, seed=31).encode())["doc_id"]
+    question = {"question": "Who chaired the committee?", "doc_id": doc_id}
+    first = client.post("/ask", json=question).json()
+
+    held = HeldSlots(client, "embeddings")
+    try:
+        answer = in_thread(client.post, "/ask", json=question).result(timeout=10)
+        streamed = in_thread(client.post, "/ask/stream", json=question).result(timeout=10)
+        batch = in_thread(client.post, "/ask/batch", json={"questions": [question]}).result(timeout=10)
+    finally:
+        held.release()
+
+    assert answer.status_code == 200 and answer.json()["answer"] == first["answer"]
+    assert "event: answer" in streamed.text
+    assert batch.status_code == 200 and batch.json()[0]["answer"] == first["answer"]
+
+
+def test_challenge_retrieves_under_the_embeddings_limit(client):
+    doc_id = upload(client, "challenge.txt", generate_text(3, seed=32).encode())["doc_id"]
+
+    held = HeldSlots(client, "embeddings")
+    try:
+        challenge = in_thread(client.post, "/challenge", params={"doc_id": doc_id, "num_questions": 2})
+        time.sleep(0.5)
+        assert not challenge.done()
+    finally:
+        held.release()
+
+    response = challenge.result(timeout=30)
+    assert response.status_code == 200
+    assert all(question["doc_id"] == doc_id for question in response.json())
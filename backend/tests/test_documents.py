@@ -0,0 +1,46 @@
+from benchmarks.synthetic import generate_text
+from services.state import DocumentState
+
+from conftest import upload
+
+
+def test_session_index_is_counted_as_a_second_copy(client):
+    session = {"X-Session-Id": "memory"}
+    doc_id = upload(client, "memory.txt", generate_text(2, seed=41).encode(), "memory")["doc_id"]
+    before = DocumentState.stats()
+
+    # Asking without a doc_id builds the session's cross-document index
+    assert client.post("/ask", json={"question": "What was decided?"}, headers=session).status_code == 200
+    after = DocumentState.stats()
+
+    document = DocumentState.get_document(doc_id, "memory")
+    document_bytes = document.vector_store.index.ntotal * document.vector_store.index.d * 4
+    assert after["document_index_bytes"] == before["document_index_bytes"]
+    assert after["session_index_bytes"] - before["session_index_bytes"] == document_bytes
+
+
+def test_sessions_uploading_the_same_file_get_their_own_documents(client):
+    data = generate_text(3, seed=42).encode()
+    question = "Who chaired the council?"
+    answers = {}
+    for session in ("first", "second"):
+        hits = client.get("/cache").json()["answers"]["hits"]
+        doc_id = upload(client, "same.txt", data, session)["doc_id"]
+        headers = {"X-Session-Id": session}
+        by_id = client.post("/ask", json={"question": question, "doc_id": doc_id}, headers=headers).json()
+        # The second session is answered from the cache, which keys answers by content
+        by_session = client.post("/ask", json={"question": question}, headers=headers).json()
+        answers[session] = (doc_id, by_id, by_session)
+        cache_hits = client.get("/cache").json()["answers"]["hits"] - hits
+
+    (first_id, first, _), (second_id, second, second_session) = answers["first"], answers["second"]
+    # cache_hits is the second session's, which asked about content the first one already had answered
+    assert cache_hits >= 1
+    assert first_id != second_id
+    assert first["doc_id"] == first_id
+    assert second["doc_id"] == second_id and second_session["doc_id"] == second_id
+    assert (second["start"], second["end"]) == (first["start"], first["end"])
+
+    content = DocumentState.get_document(second_id, "second").content
+    assert content[second["start"]:second["end"]] == second["answer"]
+    assert DocumentState.get_document(second_id, "first") is None
@@ -0,0 +1,40 @@
+import shutil
+from typing import List
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores.faiss import FAISS
+from langchain_core.embeddings import Embeddings
+
+from services.index_cache import IndexCache
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic 8-dimensional vectors, so the cache can be tested without a model"""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return np.random.default_rng(sum(map(ord, text))).random(8, dtype=np.float32).tolist()
+
+
+def test_loaded_index_is_read_into_memory(tmp_path):
+    embeddings = HashEmbeddings()
+    texts = ["alpha beta", "gamma delta", "epsilon zeta"]
+    store = FAISS.from_texts(texts, embeddings, metadatas=[{"start": i} for i in range(len(texts))])
+    cache = IndexCache(str(tmp_path / "indexes"), max_bytes=1 << 20)
+    key = cache.key("content")
+    cache.save(key, store, "\n\n".join(texts))
+
+    loaded, content = cache.load(key, embeddings, "doc")
+    # Document indexes are flat, which FAISS reads into the heap rather than memory-mapping
+    assert isinstance(loaded.index, faiss.IndexFlat)
+    assert content == "\n\n".join(texts)
+
+    # The loaded copy does not depend on the cache files
+    shutil.rmtree(tmp_path / "indexes")
+    np.testing.assert_array_equal(loaded.index.reconstruct_n(0, 3), store.index.reconstruct_n(0, 3))
+    hit = loaded.similarity_search("gamma delta", k=1)[0]
+    assert hit.page_content == "gamma delta"
+    assert hit.metadata == {"start": 1, "doc_id": "doc"}
@@ -14,6 +14,11 @@ import DocumentUpload from './components/DocumentUpload';
 import AskAnything from './components/AskAnything';
 import ChallengeMode from './components/ChallengeMode';
 import DocumentSummary from './components/DocumentSummary';
+import axios from 'axios';
+
+// Identify this browser tab to the backend so its documents are kept separate
+const sessionId = window.crypto?.randomUUID?.() ?? Math.random().toString(36).slice(2);
+axios.defaults.headers.common['X-Session-Id'] = sessionId;
 
 // Create a custom theme with modern styling
 const theme = createTheme({
@@ -115,12 +120,14 @@ function App() {
   const [documentUploaded, setDocumentUploaded] = useState(false);
   const [summary, setSummary] = useState<string>('');
   const [filename, setFilename] = useState<string>('');
+  const [docId, setDocId] = useState<string>('');
   const isSmallScreen = useMediaQuery(theme.breakpoints.down('sm'));
 
-  const handleDocumentUpload = (uploadedFilename: string, documentSummary: string) => {
+  const handleDocumentUpload = (uploadedFilename: string, documentSummary: string, uploadedDocId: string) => {
     setDocumentUploaded(true);
     setSummary(documentSummary);
     setFilename(uploadedFilename);
+    setDocId(uploadedDocId);
   };
 
   return (
@@ -186,7 +193,7 @@ function App() {
                     border: `1px solid ${alpha(theme.palette.primary.main, 0.1)}`,
                   }}
                 >
-                  <DocumentSummary filename={filename} summary={summary} />
+                  <DocumentSummary filename={filename} summary={summary} docId={docId} />
                 </Paper>
 
                 <Paper
@@ -198,7 +205,7 @@ function App() {
                     border: `1px solid ${alpha(theme.palette.primary.main, 0.1)}`,
                   }}
                 >
-                  <AskAnything />
+                  <AskAnything docId={docId} />
                 </Paper>
 
                 <Paper
@@ -210,7 +217,7 @@ function App() {
                     border: `1px solid ${alpha(theme.palette.primary.main, 0.1)}`,
                   }}
                 >
-                  <ChallengeMode />
+                  <ChallengeMode docId={docId} />
                 </Paper>
               </>
             )}
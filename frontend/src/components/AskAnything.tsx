@@ -1,17 +1,25 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { Box, TextField, Button, Typography, CircularProgress, Alert, useTheme, Paper, Fade } from '@mui/material';
 import { Send, QuestionAnswer } from '@mui/icons-material';
-import axios from 'axios';
 import { alpha } from '@mui/material/styles';
+import { streamEvents } from '../sse';
 
-const AskAnything: React.FC = () => {
+interface AskAnythingProps {
+  docId: string;
+}
+
+const AskAnything: React.FC<AskAnythingProps> = ({ docId }) => {
   const [question, setQuestion] = useState('');
   const [answer, setAnswer] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [context, setContext] = useState<string | null>(null);
+  const abortRef = useRef<AbortController | null>(null);
   const theme = useTheme();
 
+  // Stop answering a question nobody is waiting for any more
+  useEffect(() => () => abortRef.current?.abort(), []);
+
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     if (!question.trim()) return;
@@ -21,23 +29,39 @@ const AskAnything: React.FC = () => {
     setAnswer(null);
     setContext(null);
 
-    try {
-      const response = await axios.post('http://localhost:8000/ask', {
-        question: question.trim()
-      });
+    abortRef.current?.abort();
+    const controller = new AbortController();
+    abortRef.current = controller;
 
-      if (response.data) {
-        setAnswer(response.data.answer);
-        setContext(response.data.context);
-      } else {
-        setError('Received invalid response from server');
-      }
+    try {
+      // The retrieved context arrives first, the answer once the model is done
+      await streamEvents(
+        'http://localhost:8000/ask/stream',
+        {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ question: question.trim(), doc_id: docId }),
+          signal: controller.signal,
+        },
+        ({ event, data }) => {
+          if (event === 'context') {
+            setContext(data.map((chunk: { text: string }) => chunk.text).join(' '));
+          } else if (event === 'answer') {
+            setAnswer(data.answer);
+            setContext(data.context);
+          } else if (event === 'error') {
+            setError(data.detail || 'Failed to get answer');
+          }
+        }
+      );
     } catch (err: any) {
-      const errorMessage = err.response?.data?.detail || err.message || 'Failed to get answer';
-      setError(errorMessage);
+      if (err.name === 'AbortError') return;
+      setError(err.message || 'Failed to get answer');
       console.error('Error:', err);
     } finally {
-      setLoading(false);
+      if (abortRef.current === controller) {
+        setLoading(false);
+      }
     }
   };
 
@@ -148,7 +172,7 @@ const AskAnything: React.FC = () => {
           </Fade>
         )}
 
-        {answer && (
+        {(answer || context) && (
           <Fade in>
             <Box sx={{ mt: 4 }}>
               <Paper
@@ -171,7 +195,7 @@ const AskAnything: React.FC = () => {
                   Answer
                 </Typography>
                 <Typography variant="body1" paragraph sx={{ whiteSpace: 'pre-wrap' }}>
-                  {answer}
+                  {answer ?? 'Reading the passages below...'}
                 </Typography>
                 {context && (
                   <Box sx={{ mt: 3 }}>
@@ -33,7 +33,11 @@ interface ErrorResponse {
   url?: string;
 }
 
-const ChallengeMode: React.FC = () => {
+interface ChallengeModeProps {
+  docId: string;
+}
+
+const ChallengeMode: React.FC<ChallengeModeProps> = ({ docId }) => {
   const [questions, setQuestions] = useState<Question[]>([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -63,7 +67,9 @@ const ChallengeMode: React.FC = () => {
     setAnswerErrors({});
 
     try {
-      const response = await axios.post('http://localhost:8000/challenge');
+      const response = await axios.post('http://localhost:8000/challenge', null, {
+        params: { doc_id: docId }
+      });
       if (response.data && Array.isArray(response.data) && response.data.length > 0) {
         setQuestions(response.data);
       } else {
@@ -85,7 +91,16 @@ const ChallengeMode: React.FC = () => {
     setAnswerErrors({ ...answerErrors, [index]: '' });
 
     try {
-      const response = await axios.post(`http://localhost:8000/evaluate?question=${encodeURIComponent(questions[index].question)}&user_answer=${encodeURIComponent(userAnswer.trim())}`);
+      const response = await axios.post('http://localhost:8000/evaluate', null, {
+        params: {
+          question: questions[index].question,
+          user_answer: userAnswer.trim(),
+          doc_id: docId,
+          // The reference answer lets the server compare without re-running the model
+          reference_answer: questions[index].answer,
+          context: questions[index].context
+        }
+      });
 
       setFeedback(prev => ({
         ...prev,
@@ -1,12 +1,46 @@
-import React from 'react';
-import { Box, Typography } from '@mui/material';
+import React, { useEffect, useState } from 'react';
+import { Box, Typography, CircularProgress } from '@mui/material';
+import { streamEvents } from '../sse';
 
 interface DocumentSummaryProps {
   filename: string;
   summary: string;
+  docId: string;
 }
 
-const DocumentSummary: React.FC<DocumentSummaryProps> = ({ filename, summary }) => {
+const DocumentSummary: React.FC<DocumentSummaryProps> = ({ filename, summary, docId }) => {
+  const [streamedSummary, setStreamedSummary] = useState('');
+  const [partials, setPartials] = useState<string[]>([]);
+  const [error, setError] = useState<string | null>(null);
+
+  useEffect(() => {
+    setStreamedSummary('');
+    setPartials([]);
+    setError(null);
+    if (summary || !docId) return;
+
+    // Show each chunk's summary as it is produced; leaving stops the summarizer
+    const controller = new AbortController();
+    streamEvents(
+      `http://localhost:8000/documents/${docId}/summary/stream`,
+      { signal: controller.signal },
+      ({ event, data }) => {
+        if (event === 'partial' && data.stage === 'summarizing') {
+          setPartials((current) => [...current, ...data.summaries]);
+        } else if (event === 'summary') {
+          setStreamedSummary(data.summary);
+        } else if (event === 'error') {
+          setError(data.detail || 'Failed to generate summary');
+        }
+      }
+    ).catch((err) => {
+      if (err.name !== 'AbortError') setError(err.message || 'Failed to generate summary');
+    });
+    return () => controller.abort();
+  }, [docId, summary]);
+
+  const finalSummary = summary || streamedSummary;
+
   return (
     <Box>
       <Typography variant="h5" gutterBottom>
@@ -15,11 +49,31 @@ const DocumentSummary: React.FC<DocumentSummaryProps> = ({ filename, summary })
       <Typography variant="subtitle1" gutterBottom color="text.secondary">
         {filename}
       </Typography>
-      <Typography variant="body1" sx={{ whiteSpace: 'pre-wrap' }}>
-        {summary}
-      </Typography>
+      {finalSummary ? (
+        <Typography variant="body1" sx={{ whiteSpace: 'pre-wrap' }}>
+          {finalSummary}
+        </Typography>
+      ) : error ? (
+        <Typography variant="body2" color="error">
+          {error}
+        </Typography>
+      ) : (
+        <Box>
+          <Box sx={{ display: 'flex', alignItems: 'center', gap: 2 }}>
+            <CircularProgress size={20} />
+            <Typography variant="body2" color="text.secondary">
+              Generating summary... You can already ask questions about the document.
+            </Typography>
+          </Box>
+          {partials.length > 0 && (
+            <Typography variant="body2" color="text.secondary" sx={{ mt: 2, whiteSpace: 'pre-wrap' }}>
+              {partials.join('\n\n')}
+            </Typography>
+          )}
+        </Box>
+      )}
     </Box>
   );
 };
 
-export default DocumentSummary; 
\ No newline at end of file
+export default DocumentSummary; 
@@ -1,18 +1,79 @@
-import React, { useState, useCallback } from 'react';
-import { Box, Button, Typography, CircularProgress, useTheme } from '@mui/material';
+import React, { useState, useCallback, useEffect, useRef } from 'react';
+import { Box, Button, Typography, CircularProgress, LinearProgress, useTheme } from '@mui/material';
 import { UploadFile, CheckCircleOutline } from '@mui/icons-material';
 import axios from 'axios';
+import { streamEvents } from '../sse';
 
 interface DocumentUploadProps {
-  onUploadSuccess: (filename: string, summary: string) => void;
+  onUploadSuccess: (filename: string, summary: string, docId: string) => void;
 }
 
+interface StageProgress {
+  done: number;
+  total: number | null;
+}
+
+interface UploadJob {
+  job_id: string;
+  status: string;
+  stage: string | null;
+  progress: { [stage: string]: StageProgress };
+  doc_id: string | null;
+  summary: string | null;
+  error: string | null;
+}
+
+const STAGE_LABELS: { [stage: string]: string } = {
+  extracting: 'Extracting pages',
+  embedding: 'Embedding chunks',
+  summarizing: 'Summarizing chunks',
+  reducing: 'Combining summaries',
+};
+
 const DocumentUpload: React.FC<DocumentUploadProps> = ({ onUploadSuccess }) => {
   const [uploading, setUploading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [dragActive, setDragActive] = useState(false);
+  const [job, setJob] = useState<UploadJob | null>(null);
+  const eventsRef = useRef<AbortController | null>(null);
   const theme = useTheme();
 
+  useEffect(() => () => eventsRef.current?.abort(), []);
+
+  const watchJob = (file: File, jobId: string) => {
+    let indexReady = false;
+    // Jobs belong to the session that uploaded them, so follow them with the session header
+    const controller = new AbortController();
+    eventsRef.current = controller;
+
+    streamEvents(
+      `http://localhost:8000/jobs/${jobId}/events`,
+      { signal: controller.signal },
+      ({ event, data }) => {
+        const update: UploadJob = data;
+        if (event === 'progress') {
+          setJob(update);
+          // Questions can be asked as soon as the document is indexed
+          if (update.doc_id && !indexReady) {
+            indexReady = true;
+            onUploadSuccess(file.name, '', update.doc_id);
+          }
+        } else if (event === 'completed') {
+          setJob(update);
+          onUploadSuccess(file.name, update.summary || '', update.doc_id || '');
+        } else if (event === 'failed') {
+          setError(`Upload failed: ${update.error || 'Unknown error'}`);
+        }
+      }
+    ).then(() => {
+      setUploading(false);
+    }).catch((err) => {
+      if (err.name === 'AbortError') return;
+      setError(`Upload failed: ${err.message || 'lost connection to the server'}`);
+      setUploading(false);
+    });
+  };
+
   const handleDrag = useCallback((e: React.DragEvent) => {
     e.preventDefault();
     e.stopPropagation();
@@ -40,33 +101,41 @@ const DocumentUpload: React.FC<DocumentUploadProps> = ({ onUploadSuccess }) => {
       return;
     }
 
+    eventsRef.current?.abort();
     setUploading(true);
     setError(null);
+    setJob(null);
 
     const formData = new FormData();
     formData.append('file', file);
 
     try {
+      // The summary is streamed separately by DocumentSummary once the document is indexed
       const response = await axios.post('http://localhost:8000/upload', formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         },
+        params: { summarize: false },
       });
 
-      if (response.data.success) {
-        onUploadSuccess(file.name, response.data.summary);
+      if (response.data.job_id) {
+        setJob(response.data);
+        watchJob(file, response.data.job_id);
       } else {
         setError('Upload failed: ' + (response.data.detail || 'Unknown error'));
+        setUploading(false);
       }
     } catch (err: any) {
       const errorMessage = err.response?.data?.detail || err.message || 'Error uploading file';
       setError(`Upload failed: ${errorMessage}`);
       console.error('Upload error:', err);
-    } finally {
       setUploading(false);
     }
   };
 
+  const stage = job?.stage ? job.progress[job.stage] : undefined;
+  const stagePercent = stage?.total ? Math.min(100, (stage.done / stage.total) * 100) : undefined;
+
   const handleFileUpload = (event: React.ChangeEvent<HTMLInputElement>) => {
     const file = event.target.files?.[0];
     if (file) {
@@ -167,13 +236,22 @@ const DocumentUpload: React.FC<DocumentUploadProps> = ({ onUploadSuccess }) => {
             backgroundColor: 'action.hover',
           }}>
             <CircularProgress size={24} sx={{ mr: 2 }} />
-            <Box>
+            <Box sx={{ flexGrow: 1 }}>
               <Typography variant="body1" fontWeight={500}>
-                Processing document...
+                {job?.stage ? `${STAGE_LABELS[job.stage] || job.stage}...` : 'Processing document...'}
               </Typography>
               <Typography variant="body2" color="text.secondary">
-                This may take a few moments
+                {stage
+                  ? `${stage.done}${stage.total ? ` of ${stage.total}` : ''} done`
+                  : 'This may take a few moments'}
               </Typography>
+              {job?.stage && (
+                <LinearProgress
+                  variant={stagePercent === undefined ? 'indeterminate' : 'determinate'}
+                  value={stagePercent}
+                  sx={{ mt: 1, borderRadius: 1 }}
+                />
+              )}
             </Box>
           </Box>
         )}
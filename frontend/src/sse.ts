@@ -0,0 +1,52 @@
+import axios from 'axios';
+
+export interface ServerEvent {
+  event: string;
+  data: any;
+}
+
+/**
+ * Read a server-sent event stream with fetch, so requests can be POSTed and
+ * carry the session header (EventSource supports neither). Aborting `signal`
+ * closes the connection, which stops the work on the server.
+ */
+export async function streamEvents(
+  url: string,
+  init: RequestInit,
+  onEvent: (event: ServerEvent) => void
+): Promise<void> {
+  const response = await fetch(url, {
+    ...init,
+    headers: {
+      'X-Session-Id': String(axios.defaults.headers.common['X-Session-Id'] ?? ''),
+      ...(init.headers || {}),
+    },
+  });
+  if (!response.ok || !response.body) {
+    const body = await response.json().catch(() => null);
+    throw new Error(body?.detail || `Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      const data: string[] = [];
+      block.split('\n').forEach((line) => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+      });
+      if (data.length) onEvent({ event, data: JSON.parse(data.join('\n')) });
+      boundary = buffer.indexOf('\n\n');
+    }
+  }
+}